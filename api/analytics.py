@@ -0,0 +1,58 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.orm import Session
+
+# Materialized views created by migration 5 (mv_phone_counts recreated by 10), refreshed after each process job
+channel_daily_counts = table(
+    "mv_channel_daily_counts", column("channel_title"), column("day"), column("message_count"),
+)
+emoji_counts = table("mv_emoji_counts", column("channel_title"), column("value"), column("count"))
+phone_counts = table("mv_phone_counts", column("channel_title"), column("value"), column("count"))
+youtube_counts = table("mv_youtube_counts", column("channel_title"), column("value"), column("count"))
+
+VIEWS = [channel_daily_counts, emoji_counts, phone_counts, youtube_counts]
+
+
+def refresh_views(db: Session) -> None:
+    """
+    Refresh every analytics view without blocking readers of the previous contents.
+    """
+    for view in VIEWS:
+        db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"))
+    db.commit()
+    logging.info("Refreshed analytics views.")
+
+
+def get_channel_daily_counts(
+    db: Session,
+    channel_title: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> list[dict]:
+    """
+    Messages per channel per day, oldest day first.
+    """
+    query = select(channel_daily_counts)
+    if channel_title:
+        query = query.where(channel_daily_counts.c.channel_title.ilike(f"%{channel_title}%"))
+    if start_date:
+        query = query.where(channel_daily_counts.c.day >= start_date.date())
+    if end_date:
+        query = query.where(channel_daily_counts.c.day <= end_date.date())
+    query = query.order_by(channel_daily_counts.c.day, channel_daily_counts.c.channel_title)
+    return [row._asdict() for row in db.execute(query)]
+
+
+def get_top_values(db: Session, view, channel_title: Optional[str] = None, limit: int = 10) -> list[dict]:
+    """
+    The most frequent values of a counts view, summed across the matching channels.
+    """
+    total = func.sum(view.c.count).label("count")
+    query = select(view.c.value, total).group_by(view.c.value)
+    if channel_title:
+        query = query.where(view.c.channel_title.ilike(f"%{channel_title}%"))
+    query = query.order_by(total.desc(), view.c.value).limit(limit)
+    return [{"value": row.value, "count": int(row.count)} for row in db.execute(query)]
@@ -1,29 +1,106 @@
 from datetime import datetime
 from operator import and_
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, literal_column, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import pandas as pd
+import base64
+import csv
+import io
+import json
+import logging
 import os,sys
-from typing import Optional,Tuple, List
+import time
+from typing import Callable, Iterator, Optional,Tuple, List
 
-from models import TelegramMessage,RawTelegramMessage
+from models import MessageHash, TelegramMessage,RawTelegramMessage
+import response_cache
 import schemas
+import totals
 
 sys.path.append(os.path.abspath(os.path.join('..', 'scripts')))
 
-from data_cleaning import DataFrameCleaner
+from data_cleaning import clean_messages, frame_from_rows
+import metrics
 
+# Rows per INSERT statement when ingesting scraped messages
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+# Batches at least this large go through COPY into a staging table instead
+INGEST_COPY_THRESHOLD = int(os.getenv("INGEST_COPY_THRESHOLD", "5000"))
 
-def get_telegram_messages(
+# Raw rows cleaned and committed together by fetch_and_process_messages
+PROCESS_CHUNK_SIZE = int(os.getenv("PROCESS_CHUNK_SIZE", "2000"))
+
+# Rows fetched per round trip when streaming an export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# Text search configuration of the generated search_vector column (migration 6).
+# 'simple' does no stemming or stop-word removal, so Amharic and English text are indexed as-is.
+SEARCH_CONFIG = "simple"
+SEARCH_HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+RAW_MESSAGE_COLUMNS = ["channel_name", "message_id", "sender", "timestamp", "message", "media", "is_processed"]
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: int) -> str:
+    """
+    Encode the (date, id) of the last row on a page into an opaque cursor string.
+    """
+    payload = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Decode a cursor produced by encode_cursor.
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(sort_value) if sort_value else None), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _paginate(query, date_column, id_column, skip: int, limit: Optional[int], cursor: Optional[str]):
+    """
+    Order newest first by (date, id) and apply either keyset (cursor) or offset pagination.
+    :return: Tuple of (list of rows, next cursor or None)
+    """
+    query = query.order_by(date_column.desc(), id_column.desc())
+
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        if cursor_date is None:
+            # NULL dates sort first when descending, so every dated row is still ahead
+            query = query.filter(or_(
+                and_(date_column.is_(None), id_column < cursor_id),
+                date_column.isnot(None),
+            ))
+        else:
+            query = query.filter(tuple_(date_column, id_column) < tuple_(cursor_date, cursor_id))
+    elif skip:
+        query = query.offset(skip)
+
+    if limit is None:
+        return query.all(), None
+
+    rows = query.limit(limit).all()
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, date_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def build_message_query(
     db: Session,
-    skip: int = 0,
-    limit: int = 10,
     channel_title: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
 ):
     """
-    Retrieve messages with pagination support and optional filters.
+    Build the filtered telegram_messages query shared by the read endpoints.
     """
     query = db.query(TelegramMessage)
 
@@ -42,28 +119,138 @@ def get_telegram_messages(
     elif end_date:
         query = query.filter(TelegramMessage.message_date <= end_date)
 
-    messages = query.offset(skip).limit(limit).all()
-    total = query.count()
+    return query
 
-    return messages, total
 
-def get_raw_telegram_message(
+def get_telegram_messages(
     db: Session,
     skip: int = 0,
-    limit: Optional[int] = None,  # Fetch all if limit is 0
+    limit: int = 10,
+    channel_title: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+    columns_only: bool = False,
+):
+    """
+    Retrieve messages with pagination support and optional filters.
+    Messages are ordered newest first by (message_date, id). When `cursor` is given,
+    keyset pagination is used and `skip` is ignored.
+    `count` selects how the total is computed (see totals.count_rows).
+    With `columns_only`, plain column dicts are returned instead of ORM objects.
+    :return: Tuple of (list of messages, total count, next cursor)
+    """
+    query = build_message_query(db, channel_title, start_date, end_date)
+
+    # Count first: seeding a counter commits, which would expire already-loaded rows
+    total = totals.count_rows(
+        db, query, totals.TELEGRAM_MESSAGES, (channel_title, start_date, end_date), count
+    )
+    if columns_only:
+        query = query.with_entities(*TelegramMessage.__table__.columns)
+    messages, next_cursor = _paginate(
+        query, TelegramMessage.message_date, TelegramMessage.id, skip, limit, cursor
+    )
+    if columns_only:
+        messages = [row._asdict() for row in messages]
+
+    return messages, total, next_cursor
+
+def iter_message_rows(
+    db: Session,
+    channel_title: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[List[dict]]:
+    """
+    Stream filtered telegram_messages rows, newest first, through a server-side cursor.
+    Only one chunk of plain column dicts is held in memory at a time.
+    :return: Iterator over lists of at most `chunk_size` row dicts
+    """
+    query = (
+        build_message_query(db, channel_title, start_date, end_date)
+        .with_entities(*TelegramMessage.__table__.columns)
+        .order_by(TelegramMessage.message_date.desc(), TelegramMessage.id.desc())
+    )
+    result = db.execute(
+        query.statement,
+        execution_options={"stream_results": True, "yield_per": chunk_size},
+    )
+    for rows in result.mappings().partitions(chunk_size):
+        yield [dict(row) for row in rows]
+
+def build_search_query(
+    db: Session,
+    q: str,
+    channel_title: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+):
+    """
+    Build the filtered full-text query over telegram_messages.search_vector.
+    The search_vector column and its GIN index are created by migration 6.
+    :return: Tuple of (query yielding matching rows and their rank, tsquery expression)
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    search_vector = literal_column("telegram_messages.search_vector")
+    rank = func.ts_rank_cd(search_vector, ts_query).label("rank")
+    query = (
+        build_message_query(db, channel_title, start_date, end_date)
+        .filter(search_vector.op("@@")(ts_query))
+        .with_entities(
+            TelegramMessage.id,
+            TelegramMessage.message_id,
+            TelegramMessage.channel_title,
+            TelegramMessage.message_date,
+            TelegramMessage.message,
+            rank,
+        )
+    )
+    return query, ts_query
+
+
+def search_telegram_messages(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 10,
+    channel_title: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Full-text search over message bodies, best match first, with highlighted snippets.
+    Snippets are only built for the returned page, since ts_headline re-parses the message text.
+    :return: List of result dicts with id, message_id, channel_title, message_date, rank and snippet
+    """
+    query, ts_query = build_search_query(db, q, channel_title, start_date, end_date)
+    page = (
+        query.order_by(literal_column("rank").desc(), TelegramMessage.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    snippet = func.ts_headline(SEARCH_CONFIG, page.c.message, ts_query, SEARCH_HEADLINE_OPTIONS)
+    statement = select(
+        page.c.id,
+        page.c.message_id,
+        page.c.channel_title,
+        page.c.message_date,
+        page.c.rank,
+        snippet.label("snippet"),
+    ).order_by(page.c.rank.desc(), page.c.id.desc())
+    return [row._asdict() for row in db.execute(statement)]
+
+def build_raw_message_query(
+    db: Session,
     channel_name: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-) -> Tuple[List[RawTelegramMessage], int]:
+):
     """
-    Retrieve raw messages with pagination and optional filters.
-    :param db: Database session
-    :param skip: Number of records to skip (for pagination)
-    :param limit: Number of records to return (page size)
-    :param channel_name: Filter messages by channel name (optional)
-    :param start_date: Filter messages by start date (optional)
-    :param end_date: Filter messages by end date (optional)
-    :return: Tuple of (list of messages, total count)
+    Build the filtered query over unprocessed raw_message rows shared by the read endpoints.
     """
     # Base query
     query = db.query(RawTelegramMessage).filter(RawTelegramMessage.is_processed == False)
@@ -85,95 +272,312 @@ def get_raw_telegram_message(
     elif end_date:
         query = query.filter(RawTelegramMessage.timestamp <= end_date)
 
+    return query
+
+
+def get_raw_telegram_message(
+    db: Session,
+    skip: int = 0,
+    limit: Optional[int] = None,  # Fetch all if limit is 0
+    channel_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+    columns_only: bool = False,
+) -> Tuple[List[RawTelegramMessage], Optional[int], Optional[str]]:
+    """
+    Retrieve raw messages with pagination and optional filters.
+    :param db: Database session
+    :param skip: Number of records to skip (for pagination)
+    :param limit: Number of records to return (page size)
+    :param channel_name: Filter messages by channel name (optional)
+    :param start_date: Filter messages by start date (optional)
+    :param end_date: Filter messages by end date (optional)
+    :param cursor: Opaque keyset cursor from a previous page; takes precedence over skip (optional)
+    :param count: How to compute the total: None (stored/cached), "estimate", "exact" or "none"
+    :param columns_only: Return plain column dicts instead of ORM objects
+    :return: Tuple of (list of messages, total count, next cursor)
+    """
+    query = build_raw_message_query(db, channel_name, start_date, end_date)
+
     # Get total count (with filters applied)
-    total = query.count()
+    total = totals.count_rows(
+        db, query, totals.RAW_MESSAGES_UNPROCESSED, (channel_name, start_date, end_date), count
+    )
+
+    if columns_only:
+        query = query.with_entities(*RawTelegramMessage.__table__.columns)
+
+    # Apply pagination, newest first by (timestamp, id)
+    messages, next_cursor = _paginate(
+        query, RawTelegramMessage.timestamp, RawTelegramMessage.id, skip, limit, cursor
+    )
+    if columns_only:
+        messages = [row._asdict() for row in messages]
+
+    return messages, total, next_cursor
+
+def _raw_message_row(msg: dict) -> dict:
+    """
+    Map a scraped message dict onto the raw_message columns, applying the same defaults as before.
+    """
+    return {
+        "channel_name": msg.get("channel_name") if msg.get("channel_name") else "No channel name",
+        "message_id": msg.get("id") if msg.get("id") else "no message id",
+        "sender": msg.get("sender") if msg.get("sender") else "No sender",
+        "timestamp": msg.get("timestamp") if msg.get("timestamp") else "No timestamp",
+        "message": msg.get("text") if msg.get("text") else "No message",
+        "media": msg.get("media") if msg.get("media") else "No media",
+        "is_processed": False,  # New messages are not processed yet
+    }
+
 
-    # Apply pagination
-    if limit is not None:
-        query = query.offset(skip).limit(limit)
+def _insert_raw_batch(db: Session, rows: list[dict]) -> list[dict]:
+    """
+    Insert one batch with a single INSERT ... ON CONFLICT (message_id) DO NOTHING RETURNING.
+    Only the rows that were actually inserted come back.
+    """
+    table = RawTelegramMessage.__table__
+    stmt = (
+        pg_insert(table)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[table.c.message_id])
+        .returning(*table.c)
+    )
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+def _copy_raw_batch(db: Session, rows: list[dict]) -> list[dict]:
+    """
+    COPY a large batch into a temporary staging table, then move it into raw_message
+    with one INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING.
+    """
+    columns = RAW_MESSAGE_COLUMNS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+
+    db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS raw_message_staging ON COMMIT DROP AS "
+        f"SELECT {', '.join(columns)} FROM raw_message WITH NO DATA"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY raw_message_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
 
-    messages = query.all()
+    result = db.execute(text(f"""
+        INSERT INTO raw_message ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM raw_message_staging
+        ON CONFLICT (message_id) DO NOTHING
+        RETURNING *
+    """))
+    inserted = [dict(row._mapping) for row in result]
+    db.execute(text("TRUNCATE raw_message_staging"))
+    return inserted
 
-    return messages, total
 
-def insert_raw_messages(db: Session, messages: list[dict]):
+def insert_raw_messages(
+    db: Session,
+    messages: list[dict],
+    batch_size: int = INGEST_BATCH_SIZE,
+    copy_threshold: int = INGEST_COPY_THRESHOLD,
+    on_progress: Optional[Callable[..., None]] = None,
+):
     """
-    Insert new messages into the raw_message table.
+    Insert new messages into the raw_message table in set-based batches.
     :param db: Database session
     :param messages: List of messages (dict format)
-    :return: Tuple of (list of new messages, total number of new messages inserted)
-    """
-    new_messages = []  # Track all newly inserted messages
-    for msg in messages:
-        # Check if the message already exists (based on message_id)
-        existing_msg = db.query(RawTelegramMessage).filter_by(message_id=msg["id"]).first()
-        if not existing_msg:
-            new_msg = RawTelegramMessage(
-                channel_name=msg.get("channel_name") if msg.get("channel_name") else "No channel name",
-                message_id=msg.get("id") if msg.get("id") else "no message id",
-                sender=msg.get("sender") if msg.get("sender") else "No sender",
-                timestamp=msg.get("timestamp") if msg.get("timestamp") else "No timestamp",
-                message=msg.get("text") if msg.get("text") else "No message",
-                media=msg.get("media") if msg.get("media") else "No media",
-                is_processed=False  # New messages are not processed yet
-            )
-            db.add(new_msg)
-            new_messages.append(new_msg)  # Add the new message to the list
-    
+    :param batch_size: Number of rows sent per INSERT statement
+    :param copy_threshold: Scrapes of at least this many rows are loaded in one COPY through a staging table
+    :param on_progress: Optional callback receiving `written` and `inserted` counts after each batch
+    :return: Tuple of (list of newly inserted rows, total number of new messages inserted)
+    """
+    # Drop repeats inside the scrape itself; the database handles repeats across scrapes
+    rows = list({row["message_id"]: row for row in map(_raw_message_row, messages)}.values())
+
+    # A scrape of at least copy_threshold rows is loaded with one COPY; smaller ones in INSERT batches
+    if len(rows) >= copy_threshold:
+        batch_size = len(rows)
+
+    new_messages = []  # Track all newly inserted rows
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        started = time.perf_counter()
+        if len(rows) >= copy_threshold:
+            inserted = _copy_raw_batch(db, batch)
+        else:
+            inserted = _insert_raw_batch(db, batch)
+        metrics.observe_insert("raw_message", len(inserted), started)
+        new_messages.extend(inserted)
+        if on_progress:
+            on_progress(written=start + len(batch), inserted=len(new_messages))
+
+    totals.bump(db, totals.RAW_MESSAGES_UNPROCESSED, len(new_messages))
     db.commit()  # Commit all new messages
+    if new_messages:
+        response_cache.bump_generation()
     total = len(new_messages)  # Calculate the total number of new messages inserted
+    logging.info("Inserted %d new raw messages out of %d scraped.", total, len(messages))
     return new_messages, total
 
 
-def fetch_and_process_messages(db: Session):
+def _telegram_message_row(row: dict) -> dict:
+    """
+    Map one cleaned DataFrame record onto the telegram_messages columns.
+    Extracted links arrive as lists or tuples, or as None/NA when Arrow list columns
+    had no text to search; those get the same 'no ...' values as the object path.
+    """
+    youtube = row["youtube"]
+    phone = row["phone"]
+    if youtube is None or youtube is pd.NA or (isinstance(youtube, (list, tuple)) and not youtube):
+        youtube = "no youtube"
+    if phone is None or phone is pd.NA:
+        phone = "no phone"
+    return {
+        "channel_title": row["channel_title"],
+        "message_id": row["message_id"],
+        "message": row["message"],
+        "message_date": row["message_date"],
+        "media_path": row["media_path"],
+        "emoji": row["emoji"],
+        "youtube": youtube[0] if isinstance(youtube, (list, tuple)) else youtube,
+        "phone": list(phone) if isinstance(phone, tuple) else phone,
+    }
+
+
+def _drop_seen_content(db: Session, rows: list[dict]) -> list[dict]:
+    """
+    Drop cleaned rows whose content hash was already stored by an earlier batch.
+    Hashes of the remaining rows are claimed in the caller's transaction, so concurrent
+    chunks cannot both keep the same content. A row whose hash belongs to its own
+    message_id (a message being reprocessed) is kept.
+    """
+    hashed = {row["content_hash"]: row["message_id"] for row in rows if row["content_hash"] is not None}
+    if not hashed:
+        return rows
+
+    # psycopg2 returns BYTEA as memoryview
+    claimed = {bytes(h) for h in db.execute(
+        pg_insert(MessageHash)
+        .values([{"content_hash": h, "message_id": message_id} for h, message_id in hashed.items()])
+        .on_conflict_do_nothing(index_elements=[MessageHash.content_hash])
+        .returning(MessageHash.content_hash)
+    ).scalars()}
+
+    conflicts = [h for h in hashed if h not in claimed]
+    if conflicts:
+        stored = db.execute(
+            select(MessageHash.content_hash, MessageHash.message_id).where(MessageHash.content_hash.in_(conflicts))
+        )
+        claimed.update(bytes(h) for h, message_id in stored if hashed[bytes(h)] == message_id)
+
+    kept = [row for row in rows if row["content_hash"] is None or row["content_hash"] in claimed]
+    if len(kept) < len(rows):
+        logging.info(f"Dropped {len(rows) - len(kept)} messages already seen in earlier batches.")
+    return kept
+
+
+def _process_chunk(db: Session, rows: list, columns: list[str]) -> int:
+    """
+    Clean one chunk of raw rows, bulk-write it to telegram_messages and mark
+    exactly those message_ids as processed, all in one transaction.
+    :return: Number of cleaned rows written
+    """
+    message_ids = [row.message_id for row in rows]
+
+    # Apply preprocessing, across CLEANER_WORKERS processes when configured
+    cleaned = clean_messages(frame_from_rows(rows, columns))
+
+    records = _drop_seen_content(db, cleaned.to_dict("records"))
+    records = [_telegram_message_row(row) for row in records]
+    if records:
+        table = TelegramMessage.__table__
+        started = time.perf_counter()
+        inserted = db.execute(
+            pg_insert(table)
+            .values(records)
+            .on_conflict_do_nothing(index_elements=[table.c.message_id])
+        )
+        metrics.observe_insert("telegram_messages", inserted.rowcount, started)
+        totals.bump(db, totals.TELEGRAM_MESSAGES, inserted.rowcount)
+
+    marked = db.execute(
+        update(RawTelegramMessage)
+        .where(RawTelegramMessage.message_id.in_(message_ids))
+        .where(RawTelegramMessage.is_processed == False)
+        .values(is_processed=True)
+    )
+    totals.bump(db, totals.RAW_MESSAGES_UNPROCESSED, -marked.rowcount)
+    db.commit()
+    response_cache.bump_generation()
+    return len(records)
+
+
+def fetch_and_process_messages(
+    db: Session,
+    chunk_size: int = PROCESS_CHUNK_SIZE,
+    on_progress: Optional[Callable[..., None]] = None,
+):
     """
     Fetch raw messages, preprocess them, and insert into the telegram_messages table.
+    Unprocessed rows are streamed through a server-side cursor and handled in chunks of
+    `chunk_size`, each committed on its own, so memory stays flat and a bad chunk only
+    rolls back itself.
+    :param on_progress: Optional callback receiving `read`, `processed` and `failed` counts after each chunk
     """
-    try:
-        # Fetch raw messages excluding 'id' and 'is_processed' columns
-        raw_messages = db.query(
+    # Fetch raw messages excluding 'id' and 'is_processed' columns
+    query = (
+        select(
             RawTelegramMessage.channel_name,
             RawTelegramMessage.message_id,
             RawTelegramMessage.sender,
             RawTelegramMessage.timestamp,
             RawTelegramMessage.message,
-            RawTelegramMessage.media
-        ).filter(RawTelegramMessage.is_processed == False).all()
-
-        # Convert raw messages to a DataFrame
-        df = pd.DataFrame([msg._asdict() for msg in raw_messages])
-        print("Columns before preprocessing:", df.columns.to_list())
-
-        # Apply preprocessing
-        cleaner = DataFrameCleaner(df)
-        cleaner.clean_text()
-        cleaner.extract_links()
-        cleaner.remove_duplicates()
-        cleaner.convert_timestamp("timestamp")
-        cleaner.clean_null_values()
-        cleaner.restructure()
-
-        print("Columns after preprocessing:", df.columns.to_list())
-
-        # Insert cleaned data into the telegram_messages table
-        for _, row in df.iterrows():
-            new_message = TelegramMessage(
-                channel_title=row["channel_name"],
-                message_id=row["message_id"],
-                message=row["message"],
-                message_date=row["timestamp"],
-                media_path=row["media"],
-                emoji=row["emoji"],
-                youtube=row["youtube"][0] if isinstance(row["youtube"], list) else row["youtube"],
-                phone=row["phone"]
-            )
-            db.add(new_message)
-           
-        # Mark raw messages as processed
-        db.query(RawTelegramMessage).filter(RawTelegramMessage.is_processed == False).update({"is_processed": True})
-        db.commit()
-
-        return {"status": "success", "message": f"{len(df)} messages processed and inserted into telegram_messages."}
-    except Exception as e:
-        db.rollback()
-        raise e
\ No newline at end of file
+            RawTelegramMessage.media,
+        )
+        .filter(RawTelegramMessage.is_processed == False)
+        .order_by(RawTelegramMessage.id)
+    )
+
+    read = 0
+    processed = 0
+    failed = 0
+    # The reader uses its own connection so the per-chunk commits on `db` do not close the cursor
+    with db.get_bind().connect() as reader:
+        result = reader.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        columns = list(result.keys())
+
+        for rows in result.partitions(chunk_size):
+            try:
+                processed += _process_chunk(db, rows, columns)
+                logging.info("Processed chunk of %d raw messages (%d written so far).", len(rows), processed)
+            except Exception as e:
+                db.rollback()
+                failed += len(rows)
+                logging.error("Failed to process chunk of %d raw messages: %s", len(rows), e)
+
+            read += len(rows)
+            if on_progress:
+                on_progress(read=read, processed=processed, failed=failed)
+
+    if failed:
+        return {
+            "status": "partial",
+            "message": f"{processed} messages processed and inserted into telegram_messages, {failed} failed.",
+            "processed": processed,
+            "failed": failed,
+        }
+    return {
+        "status": "success",
+        "message": f"{processed} messages processed and inserted into telegram_messages.",
+        "processed": processed,
+        "failed": failed,
+    }
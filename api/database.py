@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -13,11 +15,52 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL is not set in the environment or .env file.")
 
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool settings shared by the sync and async engines
+POOL_OPTIONS = {
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true"),
+}
+# Sizing settings, only accepted by QueuePool (not by e.g. the SingletonThreadPool of in-memory SQLite)
+QUEUE_POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+
+
+def pool_options(database_url: str) -> dict:
+    """
+    Pool settings for an engine on `database_url`, leaving out sizing options its pool class does not take.
+    """
+    url = make_url(database_url)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        return {**POOL_OPTIONS, **QUEUE_POOL_OPTIONS}
+    return dict(POOL_OPTIONS)
+
+# Serve the read endpoints from an async engine (asyncpg) instead of the threadpool
+DB_ASYNC = _env_flag("DB_ASYNC", "false")
+
 # Create the database engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(DATABASE_URL).set(
+        drivername="postgresql+asyncpg"
+    ).render_as_string(hide_password=False)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create a base class for SQLAlchemy models
 Base = declarative_base()
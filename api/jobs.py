@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+# Worker threads that run scrape and process jobs off the request path
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs kept in memory for GET /jobs/{id}
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_jobs = OrderedDict()  # job id -> Job, oldest first
+_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, kind: str):
+        """
+        A unit of background work and its status, progress counts and timings.
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def update_progress(self, **counts):
+        """
+        Record progress counts; used as the on_progress callback of crud functions.
+        """
+        self.progress.update(counts)
+
+
+def _run(job: Job, func: Callable[[Job], dict]):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    logging.info(f"Job {job.id} ({job.kind}) started.")
+    try:
+        job.result = func(job)
+        job.status = "succeeded"
+        logging.info(f"Job {job.id} ({job.kind}) succeeded.")
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"
+        logging.error(f"Job {job.id} ({job.kind}) failed: {e}")
+    finally:
+        job.finished_at = datetime.utcnow()
+
+
+def _prune():
+    """
+    Forget the oldest finished jobs once more than JOB_HISTORY are kept.
+    """
+    finished = [job_id for job_id, job in _jobs.items() if not job.active]
+    for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+        del _jobs[job_id]
+
+
+def submit(kind: str, func: Callable[[Job], dict]) -> Job:
+    """
+    Queue `func(job)` on the worker pool and return its Job right away.
+    If a job of the same kind is already queued or running, that job is returned instead,
+    so repeated clicks do not start overlapping scrapes or processing runs.
+    """
+    with _lock:
+        for job in _jobs.values():
+            if job.kind == kind and job.active:
+                return job
+
+        job = Job(kind)
+        _jobs[job.id] = job
+        _prune()
+
+    _executor.submit(_run, job, func)
+    return job
+
+
+def get(job_id: str) -> Optional[Job]:
+    with _lock:
+        return _jobs.get(job_id)
@@ -1,26 +1,61 @@
+import anyio
+import asyncio
+import csv
+import io
 import json
 import logging
 import os,sys
-from fastapi import FastAPI, Depends, HTTPException, Query
+import time
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from typing import Optional
 from datetime import datetime
+from urllib.parse import urlencode
 
-from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, SessionLocal,engine
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from database import DB_ASYNC, AsyncSessionLocal, SessionLocal,engine
+import analytics
 import crud
+import jobs
+import response_cache
 import schemas
+import totals
+from migrations import run_migrations
+from models import TelegramMessage
+
+# The shared metrics module and the cleaner live in scripts/
+sys.path.append(os.path.abspath(os.path.join('..', 'scripts')))
+import data_cleaning
+import metrics
 
 sys.path.append(os.path.abspath(os.path.join('..', '')))
 
 
 from app import mains
-# Create tables on startup
 
 app = FastAPI()
+# Bring the schema and indexes up to date on startup
 @app.on_event("startup")
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+def apply_migrations():
+    run_migrations(engine)
+
+
+# Size the threadpool that sync database work runs in
+@app.on_event("startup")
+async def configure_threadpool():
+    threadpool_size = os.getenv("THREADPOOL_SIZE")
+    if threadpool_size:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = int(threadpool_size)
+
+
+# Stop the cleaner's worker processes with the app
+@app.on_event("shutdown")
+def stop_cleaner_pool():
+    data_cleaning.shutdown_pool()
 
 
 
@@ -33,110 +68,441 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Dependency to get a database session
-def get_db():
-    db = SessionLocal()
+# Record request latency per route template, so path parameters do not create a series each
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
     try:
-        yield db
+        response = await call_next(request)
+        status = response.status_code
+        return response
     finally:
-        db.close()
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route else "unmatched", str(status)
+        ).observe(time.perf_counter() - started)
+
+
+class SessionRunner:
+    def __init__(self, session):
+        """
+        Runs sync crud functions against a session from an async route.
+        With DB_ASYNC the session is an AsyncSession and the call goes through run_sync on
+        the asyncpg connection; otherwise it is a regular Session used from the threadpool.
+        """
+        self.session = session
+
+    async def run(self, func, *args, **kwargs):
+        if DB_ASYNC:
+            return await self.session.run_sync(func, *args, **kwargs)
+        return await run_in_threadpool(func, self.session, *args, **kwargs)
+
+
+# Dependency for the read endpoints, backed by the async or sync engine depending on DB_ASYNC
+async def get_runner():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield SessionRunner(db)
+    else:
+        db = SessionLocal()
+        try:
+            yield SessionRunner(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+def _orjson_response(content) -> Response:
+    """
+    Encode `content` with orjson directly; FastAPI's ORJSONResponse is deprecated.
+    """
+    return Response(orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
+
+
+async def _cached_response(request: Request, key, build) -> Response:
+    """
+    Serve an encoded response from the response cache, building and storing it on a miss.
+    `build` is awaited on a miss and returns the Response to cache.
+    Answers 304 when the client's If-None-Match already holds the current ETag.
+    """
+    entry = response_cache.get(key)
+    status = "HIT"
+    if entry is None:
+        generation = response_cache.current_generation()
+        response = await build()
+        entry = response_cache.put(key, response.body, response.media_type, generation)
+        status = "MISS"
+
+    headers = {"ETag": entry.etag, "X-Cache": status}
+    if entry.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type=entry.media_type, headers=headers)
+
 
 # Endpoint to retrieve messages with pagination
 @app.get("/messages/", response_model=schemas.PaginatedMessageResponse)
-def read_messages(
+async def read_messages(
+    request: Request,
     all: bool = Query(False, description="Return all messages if True"),
     page: int = Query(1, description="Page number", ge=1),
     page_size: int = Query(10, description="Number of items per page", ge=1),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor; overrides page"),
+    count: Optional[str] = Query(None, description="Total mode: estimate, exact or none (default: stored/cached)", pattern="^(estimate|exact|none)$"),
+    fast: bool = Query(False, description="Skip ORM/pydantic and encode plain rows with orjson"),
     channel_name: Optional[str] = Query(None, description="Filter by channel title"),
     start_date: Optional[datetime] = Query(None, description="Filter by start date (format: YYYY-MM-DD)"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date (format: YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_runner),
 ):
     """
     Retrieve messages with optional pagination and filters.
-    If `all=True`, returns all messages.
+    If `all=True`, redirects to `/messages/export`, which streams every matching message as NDJSON.
     Otherwise, applies pagination and optional filters (channel_name, start_date, end_date).
+    Pass `next_cursor` from the previous response as `cursor` to page without OFFSET.
+    With `fast=True`, plain column rows are encoded with orjson and per-object validation is skipped.
+    Pages are served from the response cache until the next ingest or process run, with an ETag for If-None-Match.
     """
     try:
         if all:
-            messages = crud.get_all_messages(db)  # Fetch all messages
-            total = len(messages)
-        else:
-            skip = (page - 1) * page_size
-            messages, total = crud.get_telegram_messages(
-                db,
-                skip=skip,
+            params = {"format": "ndjson", "channel_name": channel_name, "start_date": start_date, "end_date": end_date}
+            query_string = urlencode({key: value for key, value in params.items() if value is not None})
+            return RedirectResponse(url=f"/messages/export?{query_string}", status_code=307)
+
+        async def build():
+            messages, total, next_cursor = await db.run(
+                crud.get_telegram_messages,
+                skip=(page - 1) * page_size,
                 limit=page_size,
                 channel_title=channel_name,
                 start_date=start_date,
                 end_date=end_date,
+                cursor=cursor,
+                count=count,
+                columns_only=fast,
             )
+            content = {"total": total, "messages": messages, "next_cursor": next_cursor}
+            if fast:
+                return _orjson_response(content)
+            return JSONResponse(jsonable_encoder(
+                schemas.PaginatedMessageResponse.model_validate(content, from_attributes=True)
+            ))
 
-        return {"total": total, "messages": messages}
+        key = response_cache.make_key("/messages/", {
+            "page": page, "page_size": page_size, "cursor": cursor, "count": count, "fast": fast,
+            "channel_name": channel_name, "start_date": start_date, "end_date": end_date,
+        })
+        return await _cached_response(request, key, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/messages/search", response_model=schemas.SearchResponse)
+async def search_messages(
+    q: str = Query(..., min_length=1, description="Search terms; quoted phrases, OR and -term are supported"),
+    page: int = Query(1, description="Page number", ge=1),
+    page_size: int = Query(10, description="Number of results per page", ge=1, le=100),
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    start_date: Optional[datetime] = Query(None, description="Filter by start date (format: YYYY-MM-DD)"),
+    end_date: Optional[datetime] = Query(None, description="Filter by end date (format: YYYY-MM-DD)"),
+    db: SessionRunner = Depends(get_runner),
+):
+    """
+    Full-text search over message bodies, ranked best match first.
+    Each result carries a snippet with the matching terms wrapped in <b></b>.
+    """
+    results = await db.run(
+        crud.search_telegram_messages,
+        q,
+        skip=(page - 1) * page_size,
+        limit=page_size,
+        channel_title=channel_name,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return {"query": q, "results": results}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _export_stream(format: str, channel_name, start_date, end_date):
+    """
+    Encode message chunks as NDJSON lines or CSV rows as they come off the cursor.
+    The generator owns its session so the stream outlives the request handler.
+    """
+    db = SessionLocal()
+    try:
+        chunks = crud.iter_message_rows(db, channel_title=channel_name, start_date=start_date, end_date=end_date)
+        if format == "csv":
+            # The header comes from the table, so an export with no matching rows still has one
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=[column.name for column in TelegramMessage.__table__.columns])
+            writer.writeheader()
+            yield buffer.getvalue()
+
+        for rows in chunks:
+            if format == "ndjson":
+                yield "".join(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in rows)
+                continue
+
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+# Endpoint to stream every matching message without materializing the table
+@app.get("/messages/export")
+def export_messages(
+    format: str = Query("ndjson", description="Export format: ndjson or csv", pattern="^(ndjson|csv)$"),
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    start_date: Optional[datetime] = Query(None, description="Filter by start date (format: YYYY-MM-DD)"),
+    end_date: Optional[datetime] = Query(None, description="Filter by end date (format: YYYY-MM-DD)"),
+):
+    """
+    Stream messages as NDJSON or CSV, with the same filters as `/messages/`.
+    Rows are read from a server-side cursor in chunks, so memory use does not depend on table size.
+    """
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _export_stream(format, channel_name, start_date, end_date),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=telegram_messages.{format}"},
+    )
+
+
 # Endpoint to retrieve raw messages with pagination and optional channel_title filter
 @app.get("/messages/raw", response_model=schemas.PaginatedRawMessageResponse)
-def read_raw_messages(
+async def read_raw_messages(
+    request: Request,
     page: int = Query(1, description="Page number", ge=1),
     page_size: int = Query(10, description="Number of items per page", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor; overrides page"),
+    count: Optional[str] = Query(None, description="Total mode: estimate, exact or none (default: stored/cached)", pattern="^(estimate|exact|none)$"),
+    fast: bool = Query(False, description="Skip ORM/pydantic and encode plain rows with orjson"),
     channel_name: Optional[str] = Query(None, description="Filter by channel title"),
     start_date: Optional[datetime] = Query(None, description="Filter by start date (format: YYYY-MM-DD)"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date (format: YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: SessionRunner = Depends(get_runner)
 ):
     """
     Retrieve raw messages with pagination and optional filters.
+    Pages are served from the response cache until the next ingest or process run, with an ETag for If-None-Match.
+    :param request: The incoming request, for its If-None-Match header
     :param page: Page number (starting from 1)
     :param page_size: Number of items per page
+    :param cursor: Optional keyset cursor from the previous page's next_cursor
+    :param count: Optional total mode: estimate, exact or none
+    :param fast: Return plain column rows encoded with orjson, skipping pydantic validation
     :param channel_name: Optional filter by channel title
     :param start_date: Optional filter by start date
     :param end_date: Optional filter by end date
-    :param db: Database session
-    :return: Paginated response with raw messages and total count
+    :param db: Runner for the request's database session
+    :return: Paginated response with raw messages, total count and next cursor
     """
     try:
-        skip = (page - 1) * page_size
-        messages, total = crud.get_raw_telegram_message(
-            db,
-            skip=skip,
-            limit=page_size,
-            channel_name=channel_name,
-            start_date=start_date,
-            end_date=end_date,
-        )
-        return {"total": total, "messages": messages}
+        async def build():
+            messages, total, next_cursor = await db.run(
+                crud.get_raw_telegram_message,
+                skip=(page - 1) * page_size,
+                limit=page_size,
+                channel_name=channel_name,
+                start_date=start_date,
+                end_date=end_date,
+                cursor=cursor,
+                count=count,
+                columns_only=fast,
+            )
+            content = {"total": total, "messages": messages, "next_cursor": next_cursor}
+            if fast:
+                return _orjson_response(content)
+            return JSONResponse(jsonable_encoder(
+                schemas.PaginatedRawMessageResponse.model_validate(content, from_attributes=True)
+            ))
+
+        key = response_cache.make_key("/messages/raw", {
+            "page": page, "page_size": page_size, "cursor": cursor, "count": count, "fast": fast,
+            "channel_name": channel_name, "start_date": start_date, "end_date": end_date,
+        })
+        return await _cached_response(request, key, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/messages/recent")
-async def fetch_recent_messages(db: Session = Depends(get_db)):
+def _scrape_job(job: jobs.Job, batch_size: int) -> dict:
     """
-    Fetch recent messages and store them in the raw_message table.
+    Scrape the channels and store new messages in raw_message.
     """
-    result = await mains()  # Fetch messages
-    if result["status"] == "success" and "data" in result:
-        try:
-            total,messages=  crud.insert_raw_messages(db, result["data"])  # Insert into database
-            
-            return {"total": total, "messages": messages}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    else:
-        raise HTTPException(status_code=500, detail=result.get("message", "Unknown error"))
+    result = asyncio.run(mains())  # Fetch messages
+    if result["status"] != "success" or "data" not in result:
+        raise RuntimeError(result.get("message", "Unknown error"))
+    job.update_progress(scraped=len(result["data"]))
 
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        _, total = crud.insert_raw_messages(
+            db, result["data"], batch_size=batch_size, on_progress=job.update_progress
+        )  # Insert into database
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
 
-@app.post("/messages/process")
-def process_messages_endpoint(db: Session = Depends(get_db)):
+    return {
+        "total": total,
+        "rows_per_sec": round(len(result["data"]) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def _process_job(job: jobs.Job) -> dict:
     """
-    Process all unprocessed messages by cleaning and inserting them into the telegram_messages table.
+    Clean all unprocessed raw messages into telegram_messages.
     """
+    db = SessionLocal()
     try:
-        result = crud.fetch_and_process_messages(db)
+        result = crud.fetch_and_process_messages(db, on_progress=job.update_progress)
+        if result["processed"]:
+            try:
+                analytics.refresh_views(db)
+                result["analytics_refreshed"] = True
+            except Exception as e:
+                # The processed rows are already committed; the views catch up on the next run
+                db.rollback()
+                logging.error(f"Failed to refresh analytics views: {e}")
+                result["analytics_refreshed"] = False
         return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
+
+
+def _recount_job(job: jobs.Job) -> dict:
+    """
+    Recompute the stored row counters.
+    """
+    db = SessionLocal()
+    try:
+        counts = totals.recount(db)
+    finally:
+        db.close()
+    response_cache.bump_generation()
+    return counts
+
+
+@app.post("/messages/recent", response_model=schemas.JobResponse, status_code=202)
+def fetch_recent_messages(
+    batch_size: int = Query(crud.INGEST_BATCH_SIZE, description="Number of rows per INSERT batch", ge=1),
+):
+    """
+    Queue a job that fetches recent messages and stores them in the raw_message table.
+    Poll `GET /jobs/{id}` for its progress and result.
+    """
+    return jobs.submit("scrape", lambda job: _scrape_job(job, batch_size))
+
+
+@app.post("/messages/process", response_model=schemas.JobResponse, status_code=202)
+def process_messages_endpoint():
+    """
+    Queue a job that processes all unprocessed messages by cleaning and inserting them into the telegram_messages table.
+    Poll `GET /jobs/{id}` for its progress and result.
+    """
+    return jobs.submit("process", _process_job)
+
+
+@app.post("/counts/refresh", response_model=schemas.JobResponse, status_code=202)
+def refresh_counts():
+    """
+    Queue a job that recomputes the stored unfiltered totals of /messages/ and /messages/raw
+    from exact counts. Run it periodically to correct any drift.
+    """
+    return jobs.submit("recount", _recount_job)
+
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+def read_job(job_id: str):
+    """
+    Report the status, progress counts and timings of a scrape or process job.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
 
 
+# Analytics endpoints, served from the materialized views refreshed after each process job
+@app.get("/analytics/channels/daily", response_model=list[schemas.ChannelDailyCount])
+async def read_channel_daily_counts(
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    start_date: Optional[datetime] = Query(None, description="First day (format: YYYY-MM-DD)"),
+    end_date: Optional[datetime] = Query(None, description="Last day (format: YYYY-MM-DD)"),
+    db: SessionRunner = Depends(get_runner),
+):
+    """
+    Number of messages per channel per day.
+    """
+    return await db.run(
+        analytics.get_channel_daily_counts, channel_title=channel_name, start_date=start_date, end_date=end_date
+    )
+
+
+async def _top_values(db: SessionRunner, view, channel_name: Optional[str], limit: int):
+    return await db.run(analytics.get_top_values, view, channel_title=channel_name, limit=limit)
+
+
+@app.get("/analytics/emojis", response_model=list[schemas.ValueCount])
+async def read_top_emojis(
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    limit: int = Query(10, description="Number of emojis to return", ge=1, le=1000),
+    db: SessionRunner = Depends(get_runner),
+):
+    """
+    Most used emojis and the number of messages using each.
+    """
+    return await _top_values(db, analytics.emoji_counts, channel_name, limit)
+
+
+@app.get("/analytics/phones", response_model=list[schemas.ValueCount])
+async def read_top_phones(
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    limit: int = Query(10, description="Number of phone numbers to return", ge=1, le=1000),
+    db: SessionRunner = Depends(get_runner),
+):
+    """
+    Most frequent phone numbers and the number of messages containing each.
+    """
+    return await _top_values(db, analytics.phone_counts, channel_name, limit)
+
+
+@app.get("/analytics/youtube", response_model=list[schemas.ValueCount])
+async def read_youtube_counts(
+    channel_name: Optional[str] = Query(None, description="Filter by channel title"),
+    limit: int = Query(10, description="Number of links to return", ge=1, le=1000),
+    db: SessionRunner = Depends(get_runner),
+):
+    """
+    Most shared YouTube links and the number of messages containing each.
+    """
+    return await _top_values(db, analytics.youtube_counts, channel_name, limit)
+
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    """
+    Hit, miss and eviction counters of the response cache.
+    """
+    return response_cache.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """
+    Prometheus metrics: request latency, scrape, cleaner-stage and insert timings from this
+    process, plus the metrics files written by standalone runs such as object detection.
+    """
+    return Response(generate_latest() + metrics.read_textfiles(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,265 @@
+import logging
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from database import SessionLocal, engine as default_engine
+from models import RawTelegramMessage, TelegramMessage
+import crud
+import totals
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers do not migrate at the same time
+MIGRATION_LOCK_ID = 7_240_001
+
+# Ordered list of (version, description, statements). Append new versions; never edit applied ones.
+MIGRATIONS = [
+    (1, "create base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS raw_message (
+            id SERIAL PRIMARY KEY,
+            channel_name TEXT,
+            message_id BIGINT UNIQUE,
+            sender TEXT,
+            timestamp TIMESTAMP,
+            message TEXT,
+            media TEXT,
+            is_processed BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS telegram_messages (
+            id SERIAL PRIMARY KEY,
+            channel_title TEXT,
+            message_id BIGINT UNIQUE REFERENCES raw_message(message_id) ON DELETE CASCADE,
+            message TEXT,
+            message_date TIMESTAMP,
+            media_path TEXT,
+            emoji TEXT,
+            youtube TEXT,
+            phone TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS row_counts (
+            name TEXT PRIMARY KEY,
+            row_count BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+    ]),
+    (2, "trigram indexes for channel ilike filters", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_telegram_messages_channel_title_trgm "
+        "ON telegram_messages USING gin (channel_title gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_raw_message_channel_name_trgm "
+        "ON raw_message USING gin (channel_name gin_trgm_ops)",
+    ]),
+    (3, "composite channel/date and keyset indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_telegram_messages_channel_title_message_date "
+        "ON telegram_messages (channel_title, message_date)",
+        "CREATE INDEX IF NOT EXISTS ix_raw_message_channel_name_timestamp "
+        "ON raw_message (channel_name, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_telegram_messages_message_date_id "
+        "ON telegram_messages (message_date, id)",
+    ]),
+    (4, "partial indexes on unprocessed raw rows", [
+        "CREATE INDEX IF NOT EXISTS ix_raw_message_unprocessed_timestamp_id "
+        "ON raw_message (timestamp, id) WHERE is_processed = false",
+        "CREATE INDEX IF NOT EXISTS ix_raw_message_unprocessed_id "
+        "ON raw_message (id) WHERE is_processed = false",
+    ]),
+    (5, "materialized views for the analytics endpoints", [
+        # Each view has a unique index so it can be refreshed CONCURRENTLY
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_channel_daily_counts AS
+        SELECT COALESCE(channel_title, '') AS channel_title,
+               CAST(message_date AS DATE) AS day,
+               COUNT(*) AS message_count
+        FROM telegram_messages
+        WHERE message_date IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_channel_daily_counts "
+        "ON mv_channel_daily_counts (channel_title, day)",
+        # emoji holds the extracted emojis of a message as one string, or 'no emoji'
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_emoji_counts AS
+        SELECT COALESCE(m.channel_title, '') AS channel_title, e.value, COUNT(*) AS count
+        FROM telegram_messages AS m
+        CROSS JOIN LATERAL regexp_split_to_table(m.emoji, '') AS e(value)
+        WHERE m.emoji IS NOT NULL AND m.emoji <> 'no emoji' AND e.value <> ''
+        GROUP BY 1, 2
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_emoji_counts ON mv_emoji_counts (channel_title, value)",
+        # phone is stored from a Python list, i.e. as a '{a,b}' array literal
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_phone_counts AS
+        SELECT COALESCE(m.channel_title, '') AS channel_title, p.value, COUNT(*) AS count
+        FROM telegram_messages AS m
+        CROSS JOIN LATERAL unnest(
+            CASE WHEN m.phone LIKE '{%}' THEN CAST(m.phone AS TEXT[]) ELSE ARRAY[m.phone] END
+        ) AS p(value)
+        WHERE m.phone IS NOT NULL AND p.value <> ''
+        GROUP BY 1, 2
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_phone_counts ON mv_phone_counts (channel_title, value)",
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_youtube_counts AS
+        SELECT COALESCE(channel_title, '') AS channel_title, youtube AS value, COUNT(*) AS count
+        FROM telegram_messages
+        WHERE youtube IS NOT NULL AND youtube <> 'no youtube'
+        GROUP BY 1, 2
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_youtube_counts ON mv_youtube_counts (channel_title, value)",
+    ]),
+    (6, "full-text search column on telegram_messages", [
+        # The configuration must match crud.SEARCH_CONFIG
+        "ALTER TABLE telegram_messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(message, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_telegram_messages_search_vector "
+        "ON telegram_messages USING gin (search_vector)",
+    ]),
+    (7, "content hashes for cross-batch deduplication", [
+        """
+        CREATE TABLE IF NOT EXISTS message_hashes (
+            content_hash BYTEA PRIMARY KEY,
+            message_id BIGINT NOT NULL,
+            first_seen TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """,
+    ]),
+    (8, "drop channel/date btree indexes the ilike channel filters cannot use", [
+        "DROP INDEX IF EXISTS ix_telegram_messages_channel_title_message_date",
+        "DROP INDEX IF EXISTS ix_raw_message_channel_name_timestamp",
+    ]),
+    (9, "seed the row_counts counters with exact counts", [
+        totals.COUNTER_LOCK,
+        *(
+            f"INSERT INTO row_counts (name, row_count) SELECT '{name}', ({count_sql}) "
+            "ON CONFLICT (name) DO UPDATE SET row_count = EXCLUDED.row_count"
+            for name, count_sql in totals.COUNTER_QUERIES.items()
+        ),
+    ]),
+    (10, "exclude the 'no phone' placeholder from mv_phone_counts", [
+        "DROP MATERIALIZED VIEW IF EXISTS mv_phone_counts",
+        """
+        CREATE MATERIALIZED VIEW mv_phone_counts AS
+        SELECT COALESCE(m.channel_title, '') AS channel_title, p.value, COUNT(*) AS count
+        FROM telegram_messages AS m
+        CROSS JOIN LATERAL unnest(
+            CASE WHEN m.phone LIKE '{%}' THEN CAST(m.phone AS TEXT[]) ELSE ARRAY[m.phone] END
+        ) AS p(value)
+        WHERE m.phone IS NOT NULL AND p.value <> '' AND p.value <> 'no phone'
+        GROUP BY 1, 2
+        """,
+        "CREATE UNIQUE INDEX ux_mv_phone_counts ON mv_phone_counts (channel_title, value)",
+    ]),
+]
+
+
+def run_migrations(engine: Engine = default_engine) -> list[int]:
+    """
+    Apply every migration newer than the versions recorded in schema_migrations.
+    :return: List of versions applied by this call
+    """
+    applied_now = []
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+        applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+        for version, description, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            logging.info(f"Applying migration {version}: {description}")
+            for statement in statements:
+                connection.execute(text(statement))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description},
+            )
+            applied_now.append(version)
+
+    if applied_now:
+        logging.info(f"✅ Applied migrations: {applied_now}")
+    return applied_now
+
+
+def _index_check_queries(db):
+    """
+    The queries behind the API read paths, with representative filter values.
+    """
+    since = "2024-01-01"
+    until = "2024-02-01"
+
+    def newest_first(query, model, date_column):
+        return query.order_by(date_column.desc(), model.id.desc()).limit(10)
+
+    return {
+        "messages: page": newest_first(
+            crud.build_message_query(db), TelegramMessage, TelegramMessage.message_date),
+        "messages: channel filter": newest_first(
+            crud.build_message_query(db, channel_title="CheMed"), TelegramMessage, TelegramMessage.message_date),
+        "messages: date range": newest_first(
+            crud.build_message_query(db, start_date=since, end_date=until), TelegramMessage, TelegramMessage.message_date),
+        "messages: search": crud.build_search_query(db, "pharmacy")[0].limit(10),
+        "raw: unprocessed page": newest_first(
+            crud.build_raw_message_query(db), RawTelegramMessage, RawTelegramMessage.timestamp),
+        "raw: channel filter": newest_first(
+            crud.build_raw_message_query(db, channel_name="CheMed"), RawTelegramMessage, RawTelegramMessage.timestamp),
+        "raw: date range": newest_first(
+            crud.build_raw_message_query(db, start_date=since, end_date=until), RawTelegramMessage, RawTelegramMessage.timestamp),
+    }
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    """
+    Names of the relations read with a sequential scan anywhere in a plan tree.
+    """
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check_indexes() -> dict[str, bool]:
+    """
+    EXPLAIN each API read query and report whether it can be answered without a sequential scan.
+    The tables are analyzed first so plans reflect current statistics, and sequential scans are
+    disabled for the check so small tables do not hide a missing index. Which index a plan picks
+    depends on the data, so any index is accepted.
+    :return: Mapping of query name to True when the plan only uses indexes
+    """
+    results = {}
+    db = SessionLocal()
+    try:
+        db.execute(text(f"ANALYZE {RawTelegramMessage.__tablename__}, {TelegramMessage.__tablename__}"))
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, query in _index_check_queries(db).items():
+            seq_scans = _seq_scans(totals.explain_plan(db, query)[0]["Plan"])
+            results[name] = not seq_scans
+            if seq_scans:
+                logging.warning(f"❌ {name}: sequential scan on {', '.join(seq_scans)}")
+            else:
+                logging.info(f"✅ {name}: uses an index")
+    finally:
+        db.rollback()
+        db.close()
+    return results
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        results = check_indexes()
+        for name, uses_index in results.items():
+            print(f"{'✅' if uses_index else '❌'} {name}")
+        sys.exit(0 if all(results.values()) else 1)
+
+    applied = run_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date.")
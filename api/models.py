@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, Boolean, ForeignKey, LargeBinary, func
 from sqlalchemy.orm import relationship
 from database import Base
 from sqlalchemy import ARRAY, String
@@ -33,3 +33,17 @@ class TelegramMessage(Base):
 
     raw_message = relationship("RawTelegramMessage", back_populates="telegram_message")
 
+
+class RowCount(Base):
+    __tablename__ = "row_counts"
+    # One row per counter, kept up to date by the ingest and process paths
+    name = Column(Text, primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+
+
+class MessageHash(Base):
+    __tablename__ = "message_hashes"
+    # Content hash of every message written to telegram_messages, used to drop reposts across batches
+    content_hash = Column(LargeBinary, primary_key=True)
+    message_id = Column(BigInteger, nullable=False)
+    first_seen = Column(DateTime, nullable=False, server_default=func.now())
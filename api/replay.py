@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join('..', '')))
+
+from database import SessionLocal
+import crud
+from scripts.landing_zone import LandingZone
+
+
+def replay(since=None, until=None, channel=None, landing_zone=None):
+    """
+    Re-ingest landed scrape batches into raw_message.
+    Messages already present are skipped by the insert, so replaying the same range twice is harmless.
+    :param since: First message date to replay (YYYY-MM-DD), inclusive
+    :param until: Last message date to replay (YYYY-MM-DD), inclusive
+    :param channel: Only replay this channel
+    :return: Tuple of (messages read, new rows inserted)
+    """
+    landing_zone = landing_zone or LandingZone()
+    read = inserted = 0
+    db = SessionLocal()
+    try:
+        for entry, messages in landing_zone.iter_batches(since=since, until=until, channel=channel):
+            _, total = crud.insert_raw_messages(db, messages)
+            read += len(messages)
+            inserted += total
+            print(f"{entry['path']}: {len(messages)} messages, {total} new")
+    finally:
+        db.close()
+    return read, inserted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay landed scrape batches into raw_message.")
+    parser.add_argument("--since", help="First message date, YYYY-MM-DD")
+    parser.add_argument("--until", help="Last message date, YYYY-MM-DD")
+    parser.add_argument("--channel", help="Only replay this channel")
+    args = parser.parse_args()
+
+    read, inserted = replay(args.since, args.until, args.channel)
+    print(f"Replayed {read} messages, {inserted} new rows inserted.")
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Hashable, Optional
+
+# Seconds a cached response is served before it is rebuilt
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+# Upper bound on the number of cached responses; the least recently used one is evicted first
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+_entries = OrderedDict()  # key -> CachedResponse
+_lock = threading.Lock()
+_generation = 0
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, media_type: str, expires_at: float):
+        """
+        An encoded response body and its ETag, derived from the body itself.
+        """
+        self.body = body
+        self.media_type = media_type
+        self.expires_at = expires_at
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def bump_generation():
+    """
+    Mark every cached response as stale. Called by the ingest and process paths after they commit.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def make_key(endpoint: str, params: dict) -> Hashable:
+    """
+    Normalize query parameters into a cache key, so equivalent requests share an entry.
+    Channel filters are matched with ILIKE, so they are compared case-insensitively.
+    """
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, str) and name.startswith("channel"):
+            value = value.strip().lower()
+        normalized.append((name, value))
+    return endpoint, tuple(normalized)
+
+
+def get(key: Hashable) -> Optional[CachedResponse]:
+    """
+    Return the live entry for `key`, counting the lookup as a hit or a miss.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            _entries.move_to_end(key)
+            stats["hits"] += 1
+            return entry
+        if entry is not None:
+            del _entries[key]
+        stats["misses"] += 1
+        return None
+
+
+def put(key: Hashable, body: bytes, media_type: str = "application/json", generation: Optional[int] = None) -> CachedResponse:
+    """
+    Store an encoded response. A response built before the last generation bump is returned but not stored.
+    """
+    entry = CachedResponse(body, media_type, time.monotonic() + RESPONSE_CACHE_TTL)
+    with _lock:
+        if generation is not None and generation != _generation:
+            return entry
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > RESPONSE_CACHE_SIZE:
+            _entries.popitem(last=False)
+            stats["evictions"] += 1
+    return entry
+
+
+def current_generation() -> int:
+    return _generation
+
+
+def snapshot() -> dict:
+    """
+    Hit/miss counters and current size of the cache.
+    """
+    with _lock:
+        return {**stats, "size": len(_entries), "max_size": RESPONSE_CACHE_SIZE, "generation": _generation}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any
 
 # Schema for Returning a Message (Response Model)
 
@@ -33,10 +33,51 @@ class RawMessageResponse(BaseModel):
 
 # Schema for Paginated Raw Message Response
 class PaginatedRawMessageResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     messages: List[RawMessageResponse]
+    next_cursor: Optional[str] = None
 
 # Schema for Paginated Response
 class PaginatedMessageResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     messages: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+# Schemas for full-text search results
+class SearchResult(BaseModel):
+    id: int
+    message_id: int
+    channel_title: Optional[str] = None
+    message_date: Optional[datetime] = None
+    rank: float
+    snippet: str
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+
+# Schema for a background scrape or process job
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: Dict[str, int] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+# Schemas for the analytics endpoints
+class ChannelDailyCount(BaseModel):
+    channel_title: str
+    day: date
+    message_count: int
+
+class ValueCount(BaseModel):
+    value: str
+    count: int
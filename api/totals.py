@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from typing import Hashable, Optional
+
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from models import RowCount
+
+# Counter names in the row_counts table
+TELEGRAM_MESSAGES = "telegram_messages"
+RAW_MESSAGES_UNPROCESSED = "raw_message_unprocessed"
+
+# Exact count behind each counter; used by the seeding migration and by recount
+COUNTER_QUERIES = {
+    TELEGRAM_MESSAGES: "SELECT count(*) FROM telegram_messages",
+    RAW_MESSAGES_UNPROCESSED: "SELECT count(*) FROM raw_message WHERE is_processed = false",
+}
+# Held while counting so no ingest or process batch commits between the count and its store
+COUNTER_LOCK = "LOCK TABLE raw_message, telegram_messages IN SHARE MODE"
+
+# Seconds a filtered COUNT(*) is reused before it is recomputed
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+# Upper bound on the number of cached filtered counts
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+
+_filtered_counts = {}  # key -> (expires_at, count)
+_lock = threading.Lock()
+
+
+def invalidate():
+    """
+    Drop every cached filtered count.
+    """
+    with _lock:
+        _filtered_counts.clear()
+
+
+def bump(db: Session, name: str, delta: int):
+    """
+    Add `delta` to a stored counter inside the caller's transaction.
+    The counters are created by a migration, so the row is always there to update.
+    """
+    if not delta:
+        return
+    db.execute(update(RowCount).where(RowCount.name == name).values(row_count=RowCount.row_count + delta))
+    invalidate()
+
+
+def stored_count(db: Session, name: str, query) -> int:
+    """
+    Read an unfiltered total from the row_counts table, falling back to counting `query`
+    if the counter is missing (before migrations have run).
+    """
+    count = db.execute(select(RowCount.row_count).where(RowCount.name == name)).scalar()
+    if count is not None:
+        return count
+    return query.order_by(None).count()
+
+
+def recount(db: Session) -> dict[str, int]:
+    """
+    Recompute every stored counter from an exact count and commit.
+    Writers are blocked while counting, so the stored totals cannot miss a concurrent batch.
+    :return: Mapping of counter name to its new total
+    """
+    db.execute(text(COUNTER_LOCK))
+    counts = {}
+    for name, count_sql in COUNTER_QUERIES.items():
+        counts[name] = db.execute(text(count_sql)).scalar()
+        db.execute(update(RowCount).where(RowCount.name == name).values(row_count=counts[name]))
+    db.commit()
+    invalidate()
+    return counts
+
+
+def cached_count(key: Hashable, query) -> int:
+    """
+    Return COUNT(*) for a filtered query, reusing the result for COUNT_CACHE_TTL seconds.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _filtered_counts.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    count = query.order_by(None).count()
+    with _lock:
+        if len(_filtered_counts) >= COUNT_CACHE_SIZE:
+            _filtered_counts.clear()
+        _filtered_counts[key] = (now + COUNT_CACHE_TTL, count)
+    return count
+
+
+def explain_plan(db: Session, query) -> list:
+    """
+    Run EXPLAIN (FORMAT JSON) for an ORM query with its bound parameters and return the plan.
+    """
+    connection = db.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan
+
+
+def estimate_count(db: Session, query) -> int:
+    """
+    Return the planner's row estimate for `query` from EXPLAIN, without running it.
+    """
+    plan = explain_plan(db, query.order_by(None))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(db: Session, query, counter: str, filters: tuple, mode: Optional[str] = None) -> Optional[int]:
+    """
+    Total for a paginated read.
+    :param query: The filtered query being paginated (ordering and limits are ignored)
+    :param counter: row_counts entry holding the unfiltered total
+    :param filters: Filter values; all None means the query is unfiltered
+    :param mode: None for counter/cached totals, or one of "estimate", "exact", "none"
+    :return: The total, or None when mode is "none"
+    """
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return query.order_by(None).count()
+    if mode == "estimate":
+        return estimate_count(db, query)
+    if all(value is None for value in filters):
+        return stored_count(db, counter, query)
+    return cached_count((counter, *filters), query)
@@ -1,8 +1,17 @@
+import asyncio
 import json
 import os
 import logging
-import re
+from telethon.errors import FloodWaitError
 from scripts.telegram_scrapper import TelegramScraper
+from scripts.landing_zone import LandingZone
+
+# Number of channels scraped at the same time
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "3"))
+# Retries for a channel after Telegram answers with FloodWait
+FLOOD_WAIT_RETRIES = int(os.getenv("FLOOD_WAIT_RETRIES", "3"))
+# Longest FloodWait we are willing to sleep through, in seconds
+FLOOD_WAIT_MAX_SECONDS = int(os.getenv("FLOOD_WAIT_MAX_SECONDS", "300"))
 
 os.makedirs("../logs", exist_ok=True)
 
@@ -31,46 +40,72 @@ async def save_metadata(file_path, data):
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
-async def fetch_data(scraper, channels, metadata_file, raw_data_folder):
+async def fetch_channel(scraper, channel, last_fetched_id, semaphore):
+    """
+    Fetch one channel, sleeping through FloodWait responses up to FLOOD_WAIT_RETRIES times.
+    The concurrency slot is only held while a request is in flight, not while backing off.
+    """
+    for attempt in range(FLOOD_WAIT_RETRIES + 1):
+        try:
+            async with semaphore:
+                return await scraper.fetch_messages(channel, limit=200, min_id=last_fetched_id)
+        except FloodWaitError as e:
+            if attempt == FLOOD_WAIT_RETRIES or e.seconds > FLOOD_WAIT_MAX_SECONDS:
+                raise
+            wait = e.seconds + 2 ** attempt
+            logging.warning(f"FloodWait on {channel}: retrying in {wait}s (attempt {attempt + 1}/{FLOOD_WAIT_RETRIES}).")
+            await asyncio.sleep(wait)
+
+
+async def fetch_data(scraper, channels, metadata_file, landing_zone, concurrency=SCRAPE_CONCURRENCY):
     metadata = await load_metadata(metadata_file)
-    os.makedirs(raw_data_folder, exist_ok=True)
-    
-    all_messages = []  # Store all fetched messages
+    os.makedirs(os.path.dirname(metadata_file), exist_ok=True)
 
-    for channel in channels:
+    semaphore = asyncio.Semaphore(concurrency)
+    metadata_lock = asyncio.Lock()
+
+    async def fetch_one(channel):
         logging.info(f"Fetching messages from {channel}...")
         last_fetched_id = metadata.get(channel, {}).get("last_fetched_id")
 
         try:
-            messages = await scraper.fetch_messages(channel, limit=200, min_id=last_fetched_id)
+            messages = await fetch_channel(scraper, channel, last_fetched_id, semaphore)
+            # A message whose photo failed to download (media None) is left out and fetched again
+            # next run, so progress stops just below the oldest one
+            retry_ids = [message["id"] for message in messages if message["media"] is None]
+            messages = [message for message in messages if message["media"] is not None]
             if messages:
-                # Sanitize the channel name to create a valid file name
-                sanitized_channel_name = re.sub(r'[^a-zA-Z0-9_]', '_', channel)
-                file_name = os.path.join(raw_data_folder, f"{sanitized_channel_name}.json")
-                with open(file_name, "w", encoding="utf-8") as f:
-                    json.dump(messages, f, ensure_ascii=False, indent=4)
-                    logging.info(f"Messages from {channel} saved to '{file_name}'.")
+                # Append the batch to the landing zone; earlier batches are kept for replay
+                landing_zone.append(channel, messages)
 
-                metadata[channel] = {
-                    "last_fetched_id": messages[0]["id"],
-                    "last_fetched_time": messages[0]["timestamp"]
-                }
+                # Persist this channel's progress now so a later failure does not lose it
+                async with metadata_lock:
+                    metadata[channel] = {
+                        "last_fetched_id": min(retry_ids) - 1 if retry_ids else messages[0]["id"],
+                        "last_fetched_time": messages[0]["timestamp"]
+                    }
+                    await save_metadata(metadata_file, metadata)
 
-                all_messages.extend(messages)  # Append messages to all_messages list
+                return messages
 
-            else:
-                logging.info(f"No new messages found for {channel}.")
+            logging.info(f"No new messages found for {channel}.")
 
         except Exception as e:
             logging.error(f"Error while fetching data from {channel}: {e}")
 
-    await save_metadata(metadata_file, metadata)
+        return []
+
+    # Each channel runs as its own task, so one slow or failing channel does not hold up the rest
+    results = await asyncio.gather(*(fetch_one(channel) for channel in channels))
     logging.info("Metadata updated successfully.")
 
+    all_messages = []  # Store all fetched messages, in channel order
+    for messages in results:
+        all_messages.extend(messages)
+
     return all_messages  # Return merged messages
 
 async def mains():
-    raw_data_folder = "../data/raw"
     metadata_fetch_file = "../metadata/last_fetched.json"
     os.makedirs("metadata", exist_ok=True)
     channels = [
@@ -84,12 +119,7 @@ async def mains():
 
     try:
         await scraper.start()  # Ensure the client is started
-        all_fetched_messages = await fetch_data(scraper, channels, metadata_fetch_file, raw_data_folder)
-        
-        # Save merged data
-        with open("../data/merged_messages.json", "w", encoding="utf-8") as f:
-            json.dump(all_fetched_messages, f, ensure_ascii=False, indent=4)
-            logging.info(f"Merged messages saved to 'data/merged_messages.json'.")
+        all_fetched_messages = await fetch_data(scraper, channels, metadata_fetch_file, LandingZone())
 
         message = "Data fetching completed successfully." if all_fetched_messages else "No new messages found."
 
@@ -103,6 +133,5 @@ async def mains():
         await scraper.close()
 
 if __name__ == "__main__":
-    import asyncio
     result = asyncio.run(mains())
     print(json.dumps(result, indent=4, ensure_ascii=False))  # Print the result
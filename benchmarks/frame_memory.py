@@ -0,0 +1,51 @@
+"""
+Memory per 100k raw messages for the object-dtype and Arrow-backed pipelines.
+
+Builds the frame from cursor-shaped tuples of seeded synthetic messages with frame_from_rows, then runs
+clean_messages, and reports DataFrame memory (deep) before and after cleaning.
+data_cleaning logs to ../logs, so run it from api/ or scripts/:
+
+    cd api && python ../benchmarks/frame_memory.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from synthetic import RAW_COLUMNS, generate_messages, raw_rows  # noqa: E402
+from data_cleaning import clean_messages, frame_from_rows  # noqa: E402
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def run(rows):
+    data = raw_rows(generate_messages(rows))
+    per_100k = 100000 / rows
+    results = []
+    for dtypes in ("object", "arrow"):
+        started = time.perf_counter()
+        df = frame_from_rows(data, RAW_COLUMNS, dtypes=dtypes)
+        raw_bytes = frame_bytes(df)
+        cleaned = clean_messages(df, workers=1)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "dtypes": dtypes,
+            "rows": rows,
+            "raw_mb_per_100k": round(raw_bytes * per_100k / 2**20, 1),
+            "cleaned_mb_per_100k": round(frame_bytes(cleaned) * per_100k / 2**20, 1),
+            "seconds": round(elapsed, 3),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare DataFrame memory of object and Arrow dtypes.")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows), indent=2))
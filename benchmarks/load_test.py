@@ -0,0 +1,80 @@
+"""
+Concurrent load test for the read endpoints.
+
+Start the API once with DB_ASYNC=false and once with DB_ASYNC=true, run this
+against each, and compare the requests/sec:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/messages/?page=1&page_size=10",
+    "/messages/?page=1&page_size=100",
+    "/messages/raw?page=1&page_size=10",
+]
+
+
+async def run_load(url, paths, total_requests, concurrency):
+    """
+    Issue `total_requests` GETs spread over `paths` with at most `concurrency` in flight.
+    :return: Summary with requests/sec, error count and latency percentiles in milliseconds
+    """
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(paths[i % len(paths)])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(total_requests / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p95": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the read endpoints.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--path", action="append", dest="paths", help="Endpoint path; repeat for several")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.url, args.paths or DEFAULT_PATHS, args.requests, args.concurrency))
+    print(json.dumps(summary, indent=4))
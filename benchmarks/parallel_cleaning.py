@@ -0,0 +1,61 @@
+"""
+Throughput of clean_messages as the number of worker processes grows.
+
+Each run cleans the same synthetic raw batch and is checked against the serial
+output. data_cleaning logs to ../logs, so run it from api/ or scripts/:
+
+    cd api && python ../benchmarks/parallel_cleaning.py --rows 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from synthetic import RAW_COLUMNS, generate_messages, raw_rows  # noqa: E402
+from data_cleaning import CLEANER_MIN_PARTITION_ROWS, clean_messages, frame_from_rows  # noqa: E402
+
+
+def make_frame(rows):
+    """
+    Raw message frame built from seeded synthetic messages, including reposts.
+    """
+    return frame_from_rows(raw_rows(generate_messages(rows)), RAW_COLUMNS)
+
+
+def run(rows, worker_counts):
+    df = make_frame(rows)
+    baseline = None
+    results = []
+    for workers in worker_counts:
+        # Warm the pool so process start-up is not counted
+        clean_messages(df.head(CLEANER_MIN_PARTITION_ROWS * workers).copy(), workers=workers)
+        started = time.perf_counter()
+        cleaned = clean_messages(df.copy(), workers=workers)
+        elapsed = time.perf_counter() - started
+
+        if baseline is None:
+            baseline = (cleaned, elapsed)
+        results.append({
+            "workers": workers,
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed, 1),
+            "speedup": round(baseline[1] / elapsed, 2),  # relative to the first worker count
+            "identical": cleaned.equals(baseline[0]),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *(n for n in (2, 4, 8, 16) if n <= cpus), cpus})
+
+    parser = argparse.ArgumentParser(description="Measure parallel cleaning throughput.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.workers), indent=2))
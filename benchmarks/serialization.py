@@ -0,0 +1,88 @@
+"""
+Micro-benchmark of the two /messages/ response paths, without a database:
+
+- default: ORM objects validated through schemas.PaginatedMessageResponse
+  (from_attributes) and encoded with the standard json module, as FastAPI does
+  for a response_model
+- fast: plain column dicts encoded directly with orjson (`fast=true`)
+
+    python benchmarks/serialization.py
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import orjson
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api")))
+# models imports database, which needs a URL to build its (unused here) engine
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from models import TelegramMessage  # noqa: E402
+import schemas  # noqa: E402
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def make_rows(count):
+    """
+    Column dicts shaped like telegram_messages rows.
+    """
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "id": i,
+            "channel_title": "Lobelia pharmacy and cosmetics",
+            "message_id": 100000 + i,
+            "message": "ለቆዳ ጤንነት የሚሆኑ ምርቶች አሉን Call 0911234567 https://www.youtube.com/watch?v=abc123 " * 3,
+            "message_date": start + timedelta(minutes=i),
+            "media_path": f"../data/media/{i}.jpg",
+            "emoji": "💊✨",
+            "youtube": "https://www.youtube.com/watch?v=abc123",
+            "phone": "{0911234567}",
+        }
+        for i in range(count)
+    ]
+
+
+def default_path(messages, total):
+    payload = {"total": total, "messages": messages, "next_cursor": None}
+    model = schemas.PaginatedMessageResponse.model_validate(payload)
+    return json.dumps(model.model_dump(mode="json")).encode()
+
+
+def fast_path(rows, total):
+    return orjson.dumps({"total": total, "messages": rows, "next_cursor": None})
+
+
+def run(repeat):
+    results = []
+    for page_size in PAGE_SIZES:
+        rows = make_rows(page_size)
+        orm_messages = [TelegramMessage(**row) for row in rows]
+        number = max(1, 10000 // page_size)
+
+        default = min(timeit.repeat(lambda: default_path(orm_messages, page_size), number=number, repeat=repeat)) / number
+        fast = min(timeit.repeat(lambda: fast_path(rows, page_size), number=number, repeat=repeat)) / number
+        results.append({
+            "page_size": page_size,
+            "default_ms": round(default * 1000, 3),
+            "fast_ms": round(fast * 1000, 3),
+            "speedup": round(default / fast, 1),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare default and fast response serialization.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for result in run(args.repeat):
+        print(
+            f"page_size={result['page_size']:>5}  default={result['default_ms']:>9.3f} ms  "
+            f"fast={result['fast_ms']:>8.3f} ms  speedup={result['speedup']}x"
+        )
@@ -0,0 +1,227 @@
+"""
+Repeatable benchmark suite over seeded synthetic messages (see synthetic.py).
+
+- cleaner: each DataFrameCleaner stage and the full clean_messages run, for object and Arrow frames,
+  plus clean_messages with the legacy engine; legacy_speedup below 1 means the default engine regressed
+- crud: insert_raw_messages and fetch_and_process_messages against PostgreSQL
+- endpoints: the read endpoints through FastAPI's TestClient, with the response cache disabled
+
+The crud and endpoint benchmarks TRUNCATE the message tables, so point --database-url at a
+dedicated database; they are skipped without it. The crud code relies on PostgreSQL features
+(ON CONFLICT, COPY, tsvector), so SQLite is not supported. Run from api/ like the API itself:
+
+    cd api && python ../benchmarks/suite.py --rows 20000 --database-url postgresql://localhost/bench --output ../bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, "..", "scripts"))
+
+from synthetic import RAW_COLUMNS, generate_messages, raw_rows  # noqa: E402
+import data_cleaning  # noqa: E402
+from data_cleaning import DataFrameCleaner, clean_messages, frame_from_rows  # noqa: E402
+
+# (stage, call) in the order clean_messages runs them
+CLEANER_STAGES = [
+    ("clean_text", lambda cleaner: cleaner.clean_text()),
+    ("extract_links", lambda cleaner: cleaner.extract_links()),
+    ("hash_content", lambda cleaner: cleaner.hash_content()),
+    ("drop_duplicates", lambda cleaner: cleaner.drop_duplicates()),
+    ("convert_timestamp", lambda cleaner: cleaner.convert_timestamp("timestamp")),
+    ("clean_null_values", lambda cleaner: cleaner.clean_null_values()),
+    ("restructure", lambda cleaner: cleaner.restructure()),
+]
+
+ENDPOINTS = [
+    "/messages/?page_size=10",
+    "/messages/?page_size=100",
+    "/messages/?page_size=100&fast=true",
+    "/messages/?page_size=10&channel_name=lobelia",
+    "/messages/raw?page_size=10",
+    "/messages/search?q=vitamin",
+    "/analytics/channels/daily",
+    "/analytics/emojis",
+]
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def bench_cleaner(messages, repeat):
+    """
+    Best-of-`repeat` time of each cleaner stage and of the whole clean_messages run,
+    with the default engine and with the legacy one.
+    """
+    rows = raw_rows(messages)
+    results = {}
+    modes = ["object"] + (["arrow"] if data_cleaning.use_arrow("arrow") else [])
+    for dtypes in modes:
+        stage_times = {stage: [] for stage, _ in CLEANER_STAGES}
+        totals = []
+        legacy_totals = []
+        for _ in range(repeat):
+            cleaner = DataFrameCleaner(frame_from_rows(rows, RAW_COLUMNS, dtypes=dtypes))
+            for stage, call in CLEANER_STAGES:
+                started = time.perf_counter()
+                call(cleaner)
+                stage_times[stage].append(time.perf_counter() - started)
+
+            df = frame_from_rows(rows, RAW_COLUMNS, dtypes=dtypes)
+            started = time.perf_counter()
+            clean_messages(df, workers=1)
+            totals.append(time.perf_counter() - started)
+
+            df = frame_from_rows(rows, RAW_COLUMNS, dtypes=dtypes)
+            started = time.perf_counter()
+            clean_messages(df, engine="legacy", workers=1)
+            legacy_totals.append(time.perf_counter() - started)
+
+        results[dtypes] = {
+            "stages": {
+                stage: {"seconds": round(min(times), 4), "rows_per_sec": _rate(len(rows), min(times))}
+                for stage, times in stage_times.items()
+            },
+            "clean_messages": {"seconds": round(min(totals), 4), "rows_per_sec": _rate(len(rows), min(totals))},
+            "clean_messages_legacy": {
+                "seconds": round(min(legacy_totals), 4), "rows_per_sec": _rate(len(rows), min(legacy_totals)),
+            },
+            "legacy_speedup": round(min(legacy_totals) / min(totals), 2),
+        }
+    return results
+
+
+def _reset(engine):
+    from sqlalchemy import text
+    from migrations import run_migrations
+
+    run_migrations(engine)
+    with engine.begin() as connection:
+        connection.execute(text("TRUNCATE raw_message, telegram_messages, message_hashes, row_counts CASCADE"))
+
+
+def bench_crud(messages):
+    """
+    Time a full ingest of `messages` into raw_message and processing into telegram_messages.
+    """
+    import crud
+    from database import SessionLocal, engine
+
+    _reset(engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        _, inserted = crud.insert_raw_messages(db, messages)
+        insert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = crud.fetch_and_process_messages(db)
+        process_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+
+    return {
+        "insert_raw_messages": {
+            "rows": inserted, "seconds": round(insert_seconds, 3), "rows_per_sec": _rate(inserted, insert_seconds),
+        },
+        "fetch_and_process_messages": {
+            "rows": result["processed"], "failed": result["failed"],
+            "seconds": round(process_seconds, 3), "rows_per_sec": _rate(inserted, process_seconds),
+        },
+    }
+
+
+def bench_endpoints(requests_per_endpoint):
+    """
+    Latency of each read endpoint over the data loaded by bench_crud.
+    """
+    from fastapi.testclient import TestClient
+    import analytics
+    from database import SessionLocal
+    from main import app
+
+    db = SessionLocal()
+    try:
+        analytics.refresh_views(db)
+    finally:
+        db.close()
+
+    results = {}
+    with TestClient(app) as client:
+        for path in ENDPOINTS:
+            client.get(path)  # warm up connections and plans
+            latencies = []
+            for _ in range(requests_per_endpoint):
+                started = time.perf_counter()
+                response = client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            latencies.sort()
+            results[path] = {
+                "requests": len(latencies),
+                "mean_ms": round(statistics.fmean(latencies), 3),
+                "p50_ms": round(latencies[len(latencies) // 2], 3),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rows, seed, repeat, database_url=None, requests_per_endpoint=50):
+    messages = generate_messages(rows, seed=seed)
+    report = {
+        "meta": {
+            "rows": rows,
+            "seed": seed,
+            "repeat": repeat,
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "cleaner": bench_cleaner(messages, repeat),
+    }
+    if database_url:
+        report["crud"] = bench_crud(messages)
+        report["endpoints"] = bench_endpoints(requests_per_endpoint)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and write the results as JSON.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per cleaner benchmark; the best is kept")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--database-url", help="Dedicated PostgreSQL database for the crud and endpoint benchmarks")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.database_url:
+        # Must be set before the api modules create their engine; the cache would hide the database work
+        os.environ["DATABASE_URL"] = args.database_url
+        os.environ["RESPONSE_CACHE_TTL"] = "0"
+        sys.path.insert(0, os.path.join(BENCH_DIR, "..", "api"))
+
+    report = run(args.rows, args.seed, args.repeat, args.database_url, args.requests)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,123 @@
+"""
+Seeded generator of Telegram messages shaped like TelegramScraper.fetch_messages output.
+
+The same seed always yields the same messages, so benchmark runs are comparable:
+
+    from synthetic import generate_messages, raw_rows
+    messages = generate_messages(10000, seed=42)
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+CHANNELS = [
+    "DoctorsET",
+    "Chemed Telegram Channel",
+    "Lobelia pharmacy and cosmetics",
+    "Yetenaweg",
+    "EAHCI",
+]
+
+AMHARIC_WORDS = [
+    "ለቆዳ", "ጤንነት", "የሚሆኑ", "ምርቶች", "አሉን", "መድሃኒት", "ዋጋ", "ቅናሽ", "አዲስ", "ይደውሉ",
+    "ሐኪም", "ህክምና", "ክሬም", "ቫይታሚን", "በአዲስ", "አበባ", "እናደርሳለን", "ያግኙን", "ጥራት", "ዛሬ",
+]
+ENGLISH_WORDS = [
+    "skin", "care", "vitamin", "cream", "available", "now", "price", "discount", "delivery", "order",
+    "pharmacy", "doctor", "health", "new", "stock", "call", "today", "original", "imported", "serum",
+]
+EMOJIS = ["💊", "✨", "👍", "🔥", "📞", "🚚", "❤", "✅", "💯", "😊"]
+WEBSITES = ["https://www.example.com/shop", "www.lobelia.et", "https://chemed.et/products"]
+
+
+def _phone(rng):
+    kind = rng.random()
+    if kind < 0.4:
+        return f"09{rng.randrange(10**8):08d}"
+    if kind < 0.7:
+        return f"+2519{rng.randrange(10**8):08d}"
+    if kind < 0.85:
+        return f"07{rng.randrange(10**8):08d}"
+    return f"{rng.randrange(1000, 10000)}"
+
+
+def _text(rng):
+    """
+    A mixed Amharic/English post with some emojis, phone numbers and links, split over a few lines.
+    """
+    words = [
+        rng.choice(AMHARIC_WORDS if rng.random() < 0.6 else ENGLISH_WORDS)
+        for _ in range(rng.randint(5, 40))
+    ]
+    for _ in range(rng.choices((0, 1, 2, 3), weights=(40, 30, 20, 10))[0]):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(EMOJIS))
+    for _ in range(rng.choices((0, 1, 2), weights=(50, 40, 10))[0]):
+        words.append(_phone(rng))
+    if rng.random() < 0.15:
+        words.append(f"https://www.youtube.com/watch?v={rng.getrandbits(40):010x}")
+    if rng.random() < 0.1:
+        words.append(f"https://youtu.be/{rng.getrandbits(40):010x}")
+    if rng.random() < 0.2:
+        words.append(rng.choice(WEBSITES))
+
+    lines = []
+    while words:
+        take = rng.randint(4, 12)
+        lines.append(" ".join(words[:take]))
+        words = words[take:]
+    return "\n".join(lines)
+
+
+def generate_messages(count, seed=42, repost_rate=0.02, media_rate=0.3, empty_rate=0.05,
+                      start=datetime(2025, 1, 1, tzinfo=timezone.utc)):
+    """
+    Generate `count` scraped-message dicts (id, channel_name, sender, timestamp, text, media).
+    :param repost_rate: Share of messages that repeat an earlier message's text in the same channel
+    :param media_rate: Share of messages with a downloaded photo
+    :param empty_rate: Share of media-only messages without text
+    """
+    rng = random.Random(seed)
+    posted = {channel: [] for channel in CHANNELS}
+    messages = []
+    timestamp = start
+    for i in range(count):
+        channel = rng.choice(CHANNELS)
+        timestamp += timedelta(seconds=rng.randint(1, 600))
+        if posted[channel] and rng.random() < repost_rate:
+            text = rng.choice(posted[channel])
+        elif rng.random() < empty_rate:
+            text = ""
+        else:
+            text = _text(rng)
+            posted[channel].append(text)
+        messages.append({
+            "id": 1_000_000 + i,
+            "channel_name": channel,
+            "sender": -1001000000000 - CHANNELS.index(channel),
+            "timestamp": timestamp.isoformat(),
+            "text": text,
+            "media": f"../data/media/{rng.getrandbits(64):016x}.jpg" if rng.random() < media_rate else "No media",
+        })
+    return messages
+
+
+# Column order of the raw_message query in crud.fetch_and_process_messages
+RAW_COLUMNS = ["channel_name", "message_id", "sender", "timestamp", "message", "media"]
+
+
+def raw_rows(messages):
+    """
+    The messages as cursor-shaped tuples in RAW_COLUMNS order, as insert_raw_messages stores them:
+    the defaults of crud._raw_message_row (e.g. "No message" for empty text) are applied, and
+    timestamps are parsed as the database returns them.
+    """
+    return [
+        (
+            msg["channel_name"] or "No channel name",
+            msg["id"],
+            str(msg["sender"]) if msg["sender"] else "No sender",
+            datetime.fromisoformat(msg["timestamp"]).replace(tzinfo=None),
+            msg["text"] or "No message",
+            msg["media"] or "No media",
+        )
+        for msg in messages
+    ]
@@ -0,0 +1,30 @@
+{{
+    config(
+        unique_key='message_id',
+        incremental_strategy='delete+insert',
+        indexes=[
+            {'columns': ['message_id'], 'unique': True},
+            {'columns': ['telegram_message_id']},
+            {'columns': ['channel_title', 'telegram_message_id']},
+            {'columns': ['channel_title', 'message_date']},
+        ]
+    )
+}}
+
+SELECT
+    telegram_message_id,
+    message_id,
+    channel_title,
+    message,
+    message_date,
+    message_day,
+    media_path IS NOT NULL AS has_media,
+    emoji IS NOT NULL AS has_emoji,
+    youtube IS NOT NULL AS has_youtube,
+    phone IS NOT NULL AS has_phone
+FROM {{ ref('stg_telegram_messages') }}
+{% if is_incremental() %}
+-- telegram_messages.id only grows, so this picks up new rows whatever their message_date;
+-- a reprocessed message gets a new id and replaces its old row through unique_key
+WHERE telegram_message_id > (SELECT COALESCE(MAX(telegram_message_id), 0) FROM {{ this }})
+{% endif %}
@@ -0,0 +1,38 @@
+{{
+    config(
+        unique_key=['channel_title', 'message_day'],
+        incremental_strategy='delete+insert',
+        indexes=[
+            {'columns': ['channel_title', 'message_day'], 'unique': True},
+            {'columns': ['message_day']},
+        ]
+    )
+}}
+
+{% if is_incremental() %}
+-- Only the channel-days that received new messages since the last build are recomputed
+WITH touched_days AS (
+    SELECT DISTINCT channel_title, message_day
+    FROM {{ ref('fct_messages') }}
+    WHERE telegram_message_id > (SELECT COALESCE(MAX(max_telegram_message_id), 0) FROM {{ this }})
+)
+{% endif %}
+
+SELECT
+    f.channel_title,
+    f.message_day,
+    COUNT(*) AS message_count,
+    COUNT(*) FILTER (WHERE f.has_media) AS media_count,
+    COUNT(*) FILTER (WHERE f.has_emoji) AS emoji_count,
+    COUNT(*) FILTER (WHERE f.has_youtube) AS youtube_count,
+    COUNT(*) FILTER (WHERE f.has_phone) AS phone_count,
+    MIN(f.message_date) AS first_message_at,
+    MAX(f.message_date) AS last_message_at,
+    MAX(f.telegram_message_id) AS max_telegram_message_id
+FROM {{ ref('fct_messages') }} AS f
+{% if is_incremental() %}
+JOIN touched_days AS t
+    ON t.channel_title IS NOT DISTINCT FROM f.channel_title
+    AND t.message_day IS NOT DISTINCT FROM f.message_day
+{% endif %}
+GROUP BY f.channel_title, f.message_day
@@ -1,9 +1,17 @@
-WITH ranked_messages AS (
-    SELECT 
-        *,
-        ROW_NUMBER() OVER (PARTITION BY channel_title ORDER BY id DESC) AS row_num  
-    FROM {{ source('my_source', 'telegram_messages') }}  -- Referencing the source table
-)
-SELECT * 
-FROM ranked_messages
-WHERE row_num <= 2
+{{ config(materialized='view') }}
+
+-- Two most recent messages per channel, with the same columns as the source table plus row_num.
+-- The ids are found through the (channel_title, telegram_message_id) index of fct_messages
+-- instead of ranking every message, then the rows are read from the source by primary key.
+SELECT
+    m.*,
+    ROW_NUMBER() OVER (PARTITION BY m.channel_title ORDER BY m.id DESC) AS row_num
+FROM (SELECT DISTINCT channel_title FROM {{ ref('mart_channel_daily') }}) AS channels
+CROSS JOIN LATERAL (
+    SELECT f.telegram_message_id
+    FROM {{ ref('fct_messages') }} AS f
+    WHERE f.channel_title = channels.channel_title
+    ORDER BY f.telegram_message_id DESC
+    LIMIT 2
+) AS latest
+JOIN {{ source('my_source', 'telegram_messages') }} AS m ON m.id = latest.telegram_message_id
@@ -0,0 +1,14 @@
+-- Typed, trimmed view over the processed messages; no data is copied.
+-- The pipeline's 'no ...' placeholders become NULL so downstream IS NOT NULL checks mean "present".
+SELECT
+    id AS telegram_message_id,
+    message_id,
+    TRIM(channel_title) AS channel_title,
+    message,
+    message_date,
+    CAST(message_date AS DATE) AS message_day,
+    NULLIF(NULLIF(NULLIF(media_path, ''), 'No media'), 'no media') AS media_path,
+    NULLIF(NULLIF(emoji, ''), 'no emoji') AS emoji,
+    NULLIF(NULLIF(youtube, ''), 'no youtube') AS youtube,
+    CASE WHEN phone IN ('', '{}', 'no phone') THEN NULL ELSE phone END AS phone
+FROM {{ source('my_source', 'telegram_messages') }}
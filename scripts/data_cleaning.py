@@ -1,10 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import hashlib
+import multiprocessing
 import pandas as pd
 import os
 import logging
 import re
 import emoji
 
+import metrics
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; without it frames keep object dtypes
+    pa = None
+
 # Ensure the logs directory exists
 os.makedirs("logs", exist_ok=True)
 
@@ -16,14 +26,100 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S"
 )
 
+# Cleaning engine used when none is passed explicitly: "vectorized" or "legacy"
+CLEANER_ENGINE = os.getenv("CLEANER_ENGINE", "vectorized")
+# Processes used by clean_messages; 1 keeps cleaning in the calling process
+CLEANER_WORKERS = int(os.getenv("CLEANER_WORKERS", "1"))
+# Smallest row-range partition worth sending to another process
+CLEANER_MIN_PARTITION_ROWS = int(os.getenv("CLEANER_MIN_PARTITION_ROWS", "500"))
+# Column representation built by frame_from_rows: "arrow" (needs pyarrow) or "object"
+CLEANER_DTYPES = os.getenv("CLEANER_DTYPES", "arrow")
+
+# Patterns compiled once for the vectorized engine
+YOUTUBE_PATTERN = re.compile(r'(https?://(?:www\.)?youtube(?:-nocookie)?\.com/(?:[^ \n]+)?|https?://youtu\.be/[\w\-]+)')
+WEBSITE_PATTERN = re.compile(r'(https?://[^\s]+|www\.[^\s]+)')
+PHONE_PATTERN = re.compile(r'\+251\d{9}|09\d{8}|07\d{8}|\b\d{4}\b')
+
+# The legacy path tests one character at a time against emoji.EMOJI_DATA, so only
+# single-character entries can ever match.
+EMOJI_CHARS = frozenset(key for key in emoji.EMOJI_DATA if len(key) == 1)
+# A character class listing every emoji is slow: `re` scans non-BMP members one by one for
+# each character. Instead, BMP emojis get a table-backed class and any astral character is a
+# candidate, confirmed against EMOJI_CHARS; almost all text is BMP, so few candidates reach Python.
+_BMP_EMOJI_CHARS = ''.join(sorted(re.escape(char) for char in EMOJI_CHARS if ord(char) < 0x10000))
+EMOJI_CANDIDATE_PATTERN = re.compile(f'[{_BMP_EMOJI_CHARS}\\U00010000-\\U0010FFFF]')
+
+
+def _find_emojis(text: str) -> str:
+    return ''.join(char for char in EMOJI_CANDIDATE_PATTERN.findall(text) if char in EMOJI_CHARS)
+
+
+def _strip_emojis(text: str) -> str:
+    return EMOJI_CANDIDATE_PATTERN.sub(lambda match: '' if match.group() in EMOJI_CHARS else match.group(), text)
+
+
+def use_arrow(dtypes: str = None) -> bool:
+    """
+    Whether compact Arrow-backed columns are requested and pyarrow is installed.
+    """
+    return (dtypes or CLEANER_DTYPES) == "arrow" and pa is not None
+
+
+def frame_from_rows(rows, columns, dtypes: str = None) -> pd.DataFrame:
+    """
+    Build a DataFrame column by column from cursor rows (tuples in `columns` order).
+    With Arrow dtypes, text columns are pyarrow-backed strings and channel_name is categorical,
+    instead of one Python object per cell.
+    """
+    if not use_arrow(dtypes):
+        return pd.DataFrame(rows, columns=columns)
+
+    values = dict(zip(columns, zip(*rows))) if rows else {column: () for column in columns}
+    frame = {}
+    for column in columns:
+        data = list(values[column])
+        if column == "channel_name":
+            frame[column] = pd.Categorical(data)
+        elif column in ("message", "sender", "media"):
+            frame[column] = pd.array(data, dtype=pd.StringDtype("pyarrow"))
+        else:
+            frame[column] = pd.Series(data)
+    return pd.DataFrame(frame)
+
+
+def _is_text(series: pd.Series) -> pd.Series:
+    """
+    Mask of string cells; string and categorical (of channel names) columns only hold strings or missing values.
+    """
+    if isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        return series.notna()
+    return series.map(lambda x: isinstance(x, str))
+
+
+def _is_arrow_text(series: pd.Series) -> bool:
+    """
+    Whether a column uses the pyarrow-backed string dtype built by frame_from_rows.
+    """
+    return pa is not None and series.dtype == pd.StringDtype("pyarrow")
+
+
+def _is_list_column(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.ArrowDtype) and pa.types.is_list(series.dtype.pyarrow_dtype)
+
+
 class DataFrameCleaner:
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, engine: str = None):
         """
         Initialize with a pandas DataFrame.
+        :param engine: "vectorized" (default) or "legacy" per-row implementation
         """
         self.df = df
-        logging.info("DataFrameCleaner initialized with DataFrame of shape %s", self.df.shape)
+        self.engine = engine or CLEANER_ENGINE
+        if self.engine not in ("vectorized", "legacy"):
+            raise ValueError(f"Unknown cleaner engine '{self.engine}'.")
+        logging.info("DataFrameCleaner initialized with DataFrame of shape %s (%s engine)", self.df.shape, self.engine)
 
+    @metrics.timed_stage("clean_text")
     def clean_text(self):
         """
         Clean the text by removing newlines, extra spaces, and extracting emojis.
@@ -48,10 +144,21 @@ class DataFrameCleaner:
         """
         Extract emojis from text columns and store them in a new 'emoji' column.
         """
+        if self.engine == "vectorized":
+            messages = self.df['message']
+            is_text = _is_text(messages)
+            texts = messages.where(is_text, '').astype(object)
+            self.df['emoji'] = texts.map(_find_emojis).where(is_text, 'no emoji')
+            stripped = texts.map(_strip_emojis).where(is_text, messages)
+            self.df['message'] = stripped.astype(messages.dtype) if _is_arrow_text(messages) else stripped
+            logging.info("Extracted emojis and cleaned 'message' column of emojis.")
+            return
+
         self.df['emoji'] = self.df['message'].apply(lambda x: self._get_emojis(x) if isinstance(x, str) else 'no emoji')
         self.df['message'] = self.df['message'].apply(lambda x: ''.join([char for char in x if char not in emoji.EMOJI_DATA]) if isinstance(x, str) else x)
         logging.info("Extracted emojis and cleaned 'message' column of emojis.")
 
+    @metrics.timed_stage("extract_links")
     def extract_links(self):
         """
         Extract YouTube links, website URLs, and phone numbers from the 'message' column.
@@ -59,9 +166,23 @@ class DataFrameCleaner:
         if 'message' not in self.df.columns:
             raise ValueError("Column 'message' not found in DataFrame.")
         
-        self.df['youtube'] = self.df['message'].apply(self._extract_youtube_links)
-        self.df['website'] = self.df['message'].apply(self._extract_websites)
-        self.df['phone'] = self.df['message'].apply(self._extract_phone_numbers)
+        if self.engine == "vectorized" and _is_arrow_text(self.df['message']):
+            # Arrow-backed text gets list<string> columns; rows without text hold a null list
+            list_type = pd.ArrowDtype(pa.list_(pa.string()))
+            messages = self.df['message']
+            for column, pattern in (('youtube', YOUTUBE_PATTERN), ('website', WEBSITE_PATTERN), ('phone', PHONE_PATTERN)):
+                self.df[column] = messages.str.findall(pattern).astype(list_type)
+        elif self.engine == "vectorized":
+            messages = self.df['message']
+            youtube = messages.str.findall(YOUTUBE_PATTERN)
+            website = messages.str.findall(WEBSITE_PATTERN)
+            self.df['youtube'] = youtube.where(youtube.str.len() > 0, "no youtube")
+            self.df['website'] = website.where(website.str.len() > 0, "no website")
+            self.df['phone'] = messages.str.findall(PHONE_PATTERN)
+        else:
+            self.df['youtube'] = self.df['message'].apply(self._extract_youtube_links)
+            self.df['website'] = self.df['message'].apply(self._extract_websites)
+            self.df['phone'] = self.df['message'].apply(self._extract_phone_numbers)
         
         logging.info("Extracted YouTube links, website URLs, and phone numbers.")
         return self.df
@@ -89,30 +210,69 @@ class DataFrameCleaner:
 
     def remove_duplicates(self):
         """
-        Remove duplicate rows by converting lists to tuples (hashable type).
+        Remove rows whose normalized message repeats an earlier row of the same channel.
         """
-        initial_shape = self.df.shape
+        self.hash_content()
+        return self.drop_duplicates()
+
+    @metrics.timed_stage("hash_content")
+    def hash_content(self):
+        """
+        Hash each row's channel and normalized message text (lower-cased, whitespace collapsed)
+        together with its emojis, one hash call per row. Rows without text, including the
+        'No message' placeholder written at ingest, get no hash, so media-only posts are never
+        treated as repeats.
+        :return: Series of 16-byte digests (or None) aligned with the DataFrame
+        """
+        channel_column = 'channel_name' if 'channel_name' in self.df.columns else 'channel_title'
 
-        # Convert lists to tuples in all columns
-        self.df = self.df.apply(lambda col: col.apply(lambda x: tuple(x) if isinstance(x, list) else x))
+        def normalized(column):
+            if column not in self.df.columns:
+                return pd.Series('', index=self.df.index)
+            values = self.df[column].astype(object).where(_is_text(self.df[column]), '')
+            return values.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
 
-        # Drop duplicates
-        self.df = self.df.drop_duplicates()
+        text = normalized('message')
+        content = normalized(channel_column) + '\x1f' + text + '\x1f' + normalized('emoji')
+        self.content_hashes = pd.Series(
+            [
+                hashlib.blake2b(value.encode(), digest_size=16).digest() if has_text else None
+                for value, has_text in zip(content, ~text.isin(['', 'no message']))
+            ],
+            index=self.df.index,
+            dtype=object,
+        )
+        return self.content_hashes
+
+    @metrics.timed_stage("drop_duplicates")
+    def drop_duplicates(self):
+        """
+        Drop rows whose content hash already appeared earlier in the batch. Expects hash_content to have run.
+        """
+        initial_shape = self.df.shape
+        hashes = self.content_hashes
+        keep = hashes.isna() | ~hashes.duplicated()
+        self.df = self.df[keep]
+        self.content_hashes = hashes[keep]
         final_shape = self.df.shape
         
         logging.info("Removed duplicates. Rows before: %d, Rows after: %d", initial_shape[0], final_shape[0])
         return self.df
 
+    @metrics.timed_stage("convert_timestamp")
     def convert_timestamp(self, column_name="timestamp"):
         """
         Convert timestamps from '2024-05-26 16:11:43+00:00' to '2023-12-18 17:04:02' format.
         """
         if column_name in self.df.columns:
             try:
-                self.df[column_name] = self.df[column_name].apply(
-                    lambda x: datetime.strptime(str(x).split('+')[0], "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
-                    if isinstance(x, str) else x
-                )
+                if self.engine == "vectorized":
+                    self._convert_timestamp_vectorized(column_name)
+                else:
+                    self.df[column_name] = self.df[column_name].apply(
+                        lambda x: datetime.strptime(str(x).split('+')[0], "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+                        if isinstance(x, str) else x
+                    )
                 logging.info(f"Timestamps in column '{column_name}' converted successfully.")
             except Exception as e:
                 logging.error(f"Error converting timestamps in column '{column_name}': {e}")
@@ -120,21 +280,43 @@ class DataFrameCleaner:
             logging.warning(f"Column '{column_name}' not found in DataFrame.")
         return self.df
 
+    def _convert_timestamp_vectorized(self, column_name):
+        """
+        Parse every string timestamp in one pd.to_datetime call; non-string values are left as they are.
+        """
+        column = self.df[column_name]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            return
+        is_text = _is_text(column)
+        if not is_text.any():
+            return
+
+        parsed = pd.to_datetime(column[is_text].str.split('+').str[0], format="%Y-%m-%d %H:%M:%S")
+        converted = column.copy()
+        converted[is_text] = parsed.dt.strftime("%Y-%m-%d %H:%M:%S")
+        self.df[column_name] = converted
+
+    @metrics.timed_stage("clean_null_values")
     def clean_null_values(self):
         """
         Replace NaN, None, and empty strings with 'no <column name>' in all columns.
         """
         for column in self.df.columns:
+            if _is_list_column(self.df[column]):
+                continue  # list columns hold no sentinels; a null list is mapped when rows are written
             null_mask = self.df[column].isna() | (self.df[column] == "") | (self.df[column].astype(str).str.lower() == "nan")
             null_count = null_mask.sum()
             
             if null_count > 0:
+                if isinstance(self.df[column].dtype, pd.CategoricalDtype) and f'no {column}' not in self.df[column].cat.categories:
+                    self.df[column] = self.df[column].cat.add_categories([f'no {column}'])
                 self.df.loc[null_mask, column] = f'no {column}'
                 logging.info("Replaced %d null values in column '%s' with 'no %s'.", null_count, column, column)
         
         logging.info("Null value cleaning completed. Current DataFrame shape: %s", self.df.shape)
         return self.df
 
+    @metrics.timed_stage("restructure")
     def restructure(self):
         """
         Rename columns to match the telegram_messages table schema.
@@ -145,4 +327,126 @@ class DataFrameCleaner:
             "message": "message",
             "media": "media_path"
         })
-        return self.df 
+        return self.df
+
+
+def _clean_partition(df: pd.DataFrame, engine: str):
+    """
+    The row-wise text stages of the cleaning sequence, run in a worker process.
+    :return: Tuple of (partially cleaned DataFrame, content hashes)
+    """
+    cleaner = DataFrameCleaner(df, engine=engine)
+    cleaner.clean_text()
+    cleaner.extract_links()
+    return cleaner.df, cleaner.hash_content()
+
+
+_pool = None
+_pool_workers = 0
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Reuse one process pool across calls so workers are only started once.
+    Workers come from a forkserver rather than a fork of the caller, which may be the
+    multi-threaded API process where a forked child can inherit locks held by other threads.
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the shared worker processes, if any were started.
+    """
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+        _pool_workers = 0
+
+
+def clean_messages(df: pd.DataFrame, engine: str = None, workers: int = None) -> pd.DataFrame:
+    """
+    Run the full cleaning sequence on raw messages and return the cleaned DataFrame,
+    with a `content_hash` column for cross-batch deduplication (None for rows without text).
+    With more than one worker, the text stages (emoji, link and phone extraction) run on
+    contiguous row ranges in a process pool and are reassembled in the original order.
+    Duplicate removal and the remaining stages then run once over the whole frame, so the
+    output is identical to the serial run.
+    :param workers: Number of processes; defaults to CLEANER_WORKERS
+    """
+    engine = engine or CLEANER_ENGINE
+    workers = workers or CLEANER_WORKERS
+    partitions = min(workers, len(df) // CLEANER_MIN_PARTITION_ROWS)
+
+    if partitions > 1:
+        size = -(-len(df) // partitions)
+        chunks = [df.iloc[start:start + size] for start in range(0, len(df), size)]
+        # Stage metrics recorded inside the worker processes are not collected; time the pool as one stage
+        with metrics.CLEANER_STAGE_SECONDS.labels("parallel_text_stages").time():
+            frames, hashes = zip(*_get_pool(workers).map(_clean_partition, chunks, [engine] * len(chunks)))
+        metrics.CLEANER_STAGE_ROWS.labels("parallel_text_stages").inc(len(df))
+        cleaner = DataFrameCleaner(pd.concat(frames), engine=engine)
+        cleaner.content_hashes = pd.concat(hashes)
+    else:
+        cleaner = DataFrameCleaner(df, engine=engine)
+        cleaner.clean_text()
+        cleaner.extract_links()
+        cleaner.hash_content()
+
+    cleaner.drop_duplicates()
+    cleaner.convert_timestamp("timestamp")
+    cleaner.clean_null_values()
+    cleaner.restructure()
+    cleaner.df['content_hash'] = cleaner.content_hashes
+    return cleaner.df
+
+
+def compare_parallel(df: pd.DataFrame, workers: int) -> bool:
+    """
+    Check that cleaning `df` with `workers` processes gives exactly the serial result.
+    """
+    identical = clean_messages(df.copy(), workers=1).equals(clean_messages(df.copy(), workers=workers))
+    if not identical:
+        logging.warning("Parallel cleaning with %d workers differs from the serial run for %d rows.", workers, len(df))
+    return identical
+
+
+def _comparable_records(df: pd.DataFrame) -> list:
+    """
+    Cleaned rows as plain records, with link columns in one form: matches become tuples, while
+    rows without YouTube or website links get 'no youtube'/'no website' as on the object path.
+    Arrow list columns and object lists of the same matches then compare equal.
+    """
+    def comparable(column, value):
+        if pd.api.types.is_list_like(value):
+            value = tuple(value)
+        elif value is None or value is pd.NA or (isinstance(value, float) and pd.isna(value)):
+            value = () if column in ('youtube', 'website', 'phone') else None
+        if column in ('youtube', 'website') and value == ():
+            return f"no {column}"
+        return value
+
+    return [
+        {column: comparable(column, value) for column, value in record.items()}
+        for record in df.astype(object).to_dict('records')
+    ]
+
+
+def compare_engines(df: pd.DataFrame) -> bool:
+    """
+    Run the full cleaning sequence with both engines on copies of `df` and check the results are identical.
+    Rows are compared as records, so Arrow dtypes on the vectorized side do not count as differences.
+    """
+    legacy, vectorized = (clean_messages(df.copy(), engine=engine, workers=1) for engine in ("legacy", "vectorized"))
+    identical = legacy.index.equals(vectorized.index) and _comparable_records(legacy) == _comparable_records(vectorized)
+    if identical:
+        logging.info("Legacy and vectorized engines produced identical output for %d rows.", len(df))
+    else:
+        logging.warning("Legacy and vectorized engines produced different output for %d rows.", len(df))
+    return identical
@@ -1,7 +1,15 @@
+import argparse
 import cv2
 import torch
+import hashlib
+import json
 import os
 import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
 
 # Set up logging
 logging.basicConfig(
@@ -10,71 +18,352 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-# Load the pre-trained YOLOv5 model
-logging.info("Loading YOLOv5 model...")
-try:
-    model = torch.hub.load('ultralytics/yolov5', 'yolov5s', force_reload=True)
-    logging.info("Model loaded successfully.")
-except Exception as e:
-    logging.error(f"Failed to load model: {e}")
-    exit(1)
+# Local YOLOv5 checkout (offline) or hub repo name; weights file loaded as a custom model if present
+YOLOV5_REPO = os.getenv("YOLOV5_REPO", "ultralytics/yolov5")
+YOLO_WEIGHTS = os.getenv("YOLO_WEIGHTS", "yolov5s.pt")
+# Images per inference call
+DETECT_BATCH_SIZE = int(os.getenv("DETECT_BATCH_SIZE", "8"))
+# Threads decoding images ahead of inference and writing results behind it
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "4"))
+# Torch intra-op threads on CPU; unset leaves torch's default
+TORCH_THREADS = os.getenv("TORCH_THREADS")
 
 # Define input and output folders
 input_folder = "./images"  # Change this to your images folder path
 output_folder = "./images/detected_images"
 label_folder = "./images/detected_images/labels"
+# Content hashes of processed images and the model they were processed with
+manifest_path = "./images/detected_images/manifest.json"
 
-# Create output directories if they don't exist
-os.makedirs(output_folder, exist_ok=True)
-os.makedirs(label_folder, exist_ok=True)
 
-# Process each image in the folder
-logging.info(f"Processing images in '{input_folder}' folder...")
-for filename in os.listdir(input_folder):
-    if filename.endswith((".jpg", ".jpeg", ".png")):  # Process only image files
-        image_path = os.path.join(input_folder, filename)
-        output_image_path = os.path.join(output_folder, filename)
-        label_file_path = os.path.join(label_folder, filename.rsplit('.', 1)[0] + ".txt")
+def load_model():
+    """
+    Load YOLOv5 once, from a local checkout and weights file when available, otherwise from the
+    torch hub cache (downloaded only the first time).
+    """
+    source = "local" if os.path.isdir(YOLOV5_REPO) else "github"
+    if os.path.isfile(YOLO_WEIGHTS):
+        logging.info(f"Loading YOLOv5 weights '{YOLO_WEIGHTS}' from {YOLOV5_REPO} ({source})...")
+        model = torch.hub.load(YOLOV5_REPO, "custom", path=YOLO_WEIGHTS, source=source)
+    else:
+        logging.info(f"Loading pretrained yolov5s from {YOLOV5_REPO} ({source})...")
+        model = torch.hub.load(YOLOV5_REPO, "yolov5s", source=source)
+
+    if TORCH_THREADS and not torch.cuda.is_available():
+        torch.set_num_threads(int(TORCH_THREADS))
+        logging.info(f"Using {TORCH_THREADS} torch threads on CPU.")
+    return model
+
+
+def model_version(model):
+    """
+    Identify the loaded model so a weights change invalidates the manifest.
+    The weights themselves are hashed, so the version does not depend on where they were
+    loaded from (the hub download leaves yolov5s.pt in the working directory on first run).
+    """
+    if os.getenv("YOLO_MODEL_VERSION"):
+        return os.getenv("YOLO_MODEL_VERSION")
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().numpy().tobytes())
+    return f"state_dict:{digest.hexdigest()}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def output_paths(image_path):
+    """
+    Annotated image and label file written for `image_path`.
+    """
+    filename = os.path.basename(image_path)
+    return (
+        os.path.join(output_folder, filename),
+        os.path.join(label_folder, filename.rsplit('.', 1)[0] + ".txt"),
+    )
+
+
+def load_manifest():
+    if not os.path.exists(manifest_path):
+        return {"model_version": None, "images": {}}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        logging.error(f"Error loading manifest '{manifest_path}': {e}")
+        return {"model_version": None, "images": {}}
+
+
+def save_manifest(manifest):
+    """
+    Write the manifest atomically so an interrupted run never leaves it half-written.
+    """
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, manifest_path)
 
-        try:
-            # Read image
-            img = cv2.imread(image_path)
-            if img is None:
-                logging.warning(f"Skipping {filename}: Unable to read image.")
-                continue
 
-            # Run YOLO object detection
-            logging.info(f"Running detection on {filename}...")
-            results = model(img)
+def plan_incremental(image_paths, manifest, version):
+    """
+    Compare the images on disk with the manifest.
+    Size and mtime are checked first; the content hash is only recomputed when they changed.
+    :return: Tuple of (paths to process, {path: fingerprint} for them, filenames deleted since the last run)
+    """
+    entries = manifest["images"] if manifest.get("model_version") == version else {}
+    if manifest.get("model_version") not in (None, version):
+        logging.info("Model version changed; reprocessing every image.")
 
-            # Prepare label data
-            label_data = []
+    to_process = []
+    fingerprints = {}
+    for image_path in image_paths:
+        filename = os.path.basename(image_path)
+        stat = os.stat(image_path)
+        entry = entries.get(filename)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
 
-            # Process detection results
-            for *xyxy, conf, cls in results.xyxy[0]:  # Get bounding box, confidence, and class label
+        sha256 = file_sha256(image_path)
+        fingerprint = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime}
+        if entry and entry["sha256"] == sha256:
+            # Touched but unchanged: refresh the stat fields without reprocessing
+            entries[filename] = fingerprint
+            continue
+        to_process.append(image_path)
+        fingerprints[image_path] = fingerprint
+
+    present = {os.path.basename(image_path) for image_path in image_paths}
+    deleted = [filename for filename in manifest["images"] if filename not in present]
+    return to_process, fingerprints, deleted
+
+
+def prefetch_images(executor, image_paths, depth):
+    """
+    Decode images on the thread pool, keeping at most `depth` reads in flight ahead of the consumer.
+    :return: Iterator of (image_path, image or None) in input order
+    """
+    pending = deque()
+    paths = iter(image_paths)
+    for image_path in paths:
+        pending.append((image_path, executor.submit(cv2.imread, image_path)))
+        if len(pending) >= depth:
+            break
+
+    while pending:
+        image_path, future = pending.popleft()
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append((next_path, executor.submit(cv2.imread, next_path)))
+        yield image_path, future.result()
+
+
+def batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def detect_images(model, executor, image_paths, batch_size=DETECT_BATCH_SIZE):
+    """
+    Run detection over `image_paths` in batches while the next images are decoded in the background.
+    :return: Iterator of (image_path, image, detections) where detections are
+             (class_name, confidence, x1, y1, x2, y2) tuples
+    """
+    for batch in batched(prefetch_images(executor, image_paths, batch_size * 2), batch_size):
+        readable = []
+        for image_path, img in batch:
+            if img is None:
+                logging.warning(f"Skipping {os.path.basename(image_path)}: Unable to read image.")
+            else:
+                readable.append((image_path, img))
+        if not readable:
+            continue
+
+        # Run YOLO object detection on the whole batch
+        try:
+            with metrics.DETECTION_BATCH_SECONDS.time():
+                results = model([img for _, img in readable])
+            metrics.DETECTION_IMAGES.inc(len(readable))
+        except Exception as e:
+            names = ", ".join(os.path.basename(image_path) for image_path, _ in readable)
+            logging.error(f"Error running detection on {names}: {e}")
+            continue
+
+        for (image_path, img), predictions in zip(readable, results.xyxy):
+            detections = []
+            for *xyxy, conf, cls in predictions:  # Get bounding box, confidence, and class label
                 x1, y1, x2, y2 = map(int, xyxy)  # Convert coordinates to integers
-                confidence = conf.item()
-                class_name = model.names[int(cls)]  # Convert class index to class name
-                
-                # Store label data
-                label_data.append(f"{class_name} {confidence:.2f} {x1} {y1} {x2} {y2}\n")
-
-                # Draw bounding box and label on the image
-                cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)  # Green bounding box
-                cv2.putText(img, f"{class_name} {confidence:.2f}", (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-            # Save the detected image
-            cv2.imwrite(output_image_path, img)
-            logging.info(f"Saved detected image: {output_image_path}")
-
-            # Save labels to a text file
-            with open(label_file_path, "w") as label_file:
-                label_file.writelines(label_data)
-            logging.info(f"Saved labels for {filename}: {len(label_data)} objects detected.")
+                detections.append((model.names[int(cls)], conf.item(), x1, y1, x2, y2))
+            yield image_path, img, detections
+
 
+def save_detections(image_path, img, detections, write_labels=True):
+    """
+    Draw the boxes onto the image and write it and its label file to the output folders.
+    """
+    filename = os.path.basename(image_path)
+    output_image_path, label_file_path = output_paths(image_path)
+
+    label_data = []
+    for class_name, confidence, x1, y1, x2, y2 in detections:
+        # Store label data
+        label_data.append(f"{class_name} {confidence:.2f} {x1} {y1} {x2} {y2}\n")
+
+        # Draw bounding box and label on the image
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)  # Green bounding box
+        cv2.putText(img, f"{class_name} {confidence:.2f}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+    # Save the detected image
+    cv2.imwrite(output_image_path, img)
+    logging.info(f"Saved detected image: {output_image_path}")
+
+    if not write_labels:
+        return
+
+    # Save labels to a text file
+    with open(label_file_path, "w") as label_file:
+        label_file.writelines(label_data)
+    logging.info(f"Saved labels for {filename}: {len(label_data)} objects detected.")
+
+
+def run_detection(model, image_paths, batch_size=DETECT_BATCH_SIZE, workers=DECODE_WORKERS,
+                  on_saved=None, write_labels=True):
+    """
+    Detect objects in every image and write the annotated images and labels.
+    :param on_saved: Optional callback receiving (image_path, detections) once an image's outputs are written
+    :param write_labels: Write a label text file per image
+    :return: Images per second over the whole run
+    """
+    started = time.perf_counter()
+    processed = 0
+
+    def finish(image_path, detections, future):
+        try:
+            future.result()
         except Exception as e:
-            logging.error(f"Error processing {filename}: {e}")
+            logging.error(f"Error saving detections for {os.path.basename(image_path)}: {e}")
+            return
+        if on_saved:
+            on_saved(image_path, detections)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        writes = deque()
+        for image_path, img, detections in detect_images(model, executor, image_paths, batch_size):
+            future = executor.submit(save_detections, image_path, img, detections, write_labels)
+            writes.append((image_path, detections, future))
+            processed += 1
+            # Keep the number of annotated images waiting to be written bounded
+            while len(writes) > batch_size * 2:
+                finish(*writes.popleft())
+
+        while writes:
+            finish(*writes.popleft())
+
+    elapsed = time.perf_counter() - started
+    images_per_sec = processed / elapsed if elapsed > 0 else 0.0
+    metrics.DETECTION_IMAGES_PER_SECOND.set(images_per_sec)
+    logging.info(f"Processed {processed} images in {elapsed:.2f}s ({images_per_sec:.2f} images/sec).")
+    return images_per_sec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run YOLOv5 object detection over the images folder.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process images that are new or changed since the last run (per the manifest)")
+    parser.add_argument("--to-db", action="store_true",
+                        help="Store detections straight into image_data instead of writing label files")
+    args = parser.parse_args()
+
+    # Load the pre-trained YOLOv5 model
+    try:
+        model = load_model()
+        logging.info("Model loaded successfully.")
+    except Exception as e:
+        logging.error(f"Failed to load model: {e}")
+        exit(1)
+
+    # Create output directories if they don't exist
+    os.makedirs(output_folder, exist_ok=True)
+    os.makedirs(label_folder, exist_ok=True)
+
+    # Process each image in the folder
+    logging.info(f"Processing images in '{input_folder}' folder...")
+    image_paths = [
+        os.path.join(input_folder, filename)
+        for filename in sorted(os.listdir(input_folder))
+        if filename.endswith((".jpg", ".jpeg", ".png"))  # Process only image files
+    ]
+
+    callbacks = []
+    if args.to_db:
+        import store_image_data_to_db as loader
+
+        conn = loader.connect()
+        pending = {}
+
+        def flush():
+            written = loader.store_detections(conn, pending)
+            logging.info(f"Stored {written} detected objects for {len(pending)} images.")
+            pending.clear()
+
+        def store(image_path, detections):
+            # Keyed by the label file name, the same key the label-file loader uses
+            file = os.path.basename(output_paths(image_path)[1])
+            pending[file] = [
+                loader.to_row(class_name, round(confidence, 2), x1, y1, x2, y2)
+                for class_name, confidence, x1, y1, x2, y2 in detections
+            ]
+            if len(pending) >= loader.LOAD_BATCH_FILES:
+                flush()
+
+        callbacks.append(store)
+
+    if args.incremental:
+        version = model_version(model)
+        manifest = load_manifest()
+        image_paths, fingerprints, deleted = plan_incremental(image_paths, manifest, version)
+        if manifest.get("model_version") != version:
+            manifest = {"model_version": version, "images": {}}
+
+        # Drop entries and outputs for images that no longer exist
+        for filename in deleted:
+            manifest["images"].pop(filename, None)
+            for path in output_paths(filename):
+                if os.path.exists(path):
+                    os.remove(path)
+            if args.to_db:
+                # An empty row list replaces the image's stored detections with nothing
+                pending[os.path.basename(output_paths(filename)[1])] = []
+        logging.info(f"Incremental run: {len(image_paths)} new or changed images, {len(deleted)} deleted.")
+
+        def record(image_path, detections):
+            manifest["images"][os.path.basename(image_path)] = fingerprints[image_path]
+
+        callbacks.append(record)
+
+    def on_saved(image_path, detections):
+        for callback in callbacks:
+            callback(image_path, detections)
+
+    images_per_sec = run_detection(model, image_paths, on_saved=on_saved, write_labels=not args.to_db)
+    if args.to_db:
+        flush()
+        conn.close()
+    if args.incremental:
+        save_manifest(manifest)
+    metrics.write_textfile("detection", metrics.DETECTION_REGISTRY)
 
-logging.info("Object detection completed. Check 'detected_images' and 'labels' folders.")
-print("Object detection completed. Logs are saved in 'object_detection.log'.")
+    logging.info("Object detection completed. Check 'detected_images' and 'labels' folders.")
+    print(f"Object detection completed at {images_per_sec:.2f} images/sec. Logs are saved in 'object_detection.log'.")
@@ -0,0 +1,101 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# Append-only store of raw scrape batches, partitioned by channel and message date
+LANDING_DIR = os.getenv("LANDING_DIR", "../data/landing")
+
+_manifest_lock = threading.Lock()
+
+
+def sanitize_channel(channel):
+    """
+    Turn a channel URL or name into a safe partition directory name.
+    """
+    return re.sub(r'[^a-zA-Z0-9_]', '_', channel)
+
+
+class LandingZone:
+    def __init__(self, root=LANDING_DIR):
+        """
+        Writes each scrape batch as gzip-compressed NDJSON files under
+        <root>/channel=<channel>/date=<YYYY-MM-DD>/ and records them in <root>/manifest.json.
+        Files are never rewritten, so every batch stays available for replay.
+        """
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        os.makedirs(root, exist_ok=True)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"files": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def append(self, channel, messages):
+        """
+        Write one scrape batch for `channel`, one file per message date.
+        Each file is written under a temporary name and renamed into place before it is added to the manifest.
+        :return: List of manifest entries for the files written
+        """
+        by_date = {}
+        for msg in messages:
+            by_date.setdefault(str(msg.get("timestamp") or "unknown")[:10], []).append(msg)
+
+        batch_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        entries = []
+        for date, date_messages in sorted(by_date.items()):
+            partition = os.path.join(f"channel={sanitize_channel(channel)}", f"date={date}")
+            os.makedirs(os.path.join(self.root, partition), exist_ok=True)
+            relative_path = os.path.join(partition, f"batch-{batch_id}.ndjson.gz")
+            path = os.path.join(self.root, relative_path)
+
+            with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+                for msg in date_messages:
+                    f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            os.replace(path + ".tmp", path)
+
+            ids = [msg["id"] for msg in date_messages]
+            entries.append({
+                "path": relative_path,
+                "channel": channel,
+                "date": date,
+                "count": len(date_messages),
+                "min_id": min(ids),
+                "max_id": max(ids),
+                "written_at": datetime.now(timezone.utc).isoformat(),
+            })
+
+        with _manifest_lock:
+            manifest = self.load_manifest()
+            manifest["files"].extend(entries)
+            self._save_manifest(manifest)
+
+        logging.info(f"Landed {len(messages)} messages from {channel} in {len(entries)} files.")
+        return entries
+
+    def iter_batches(self, since=None, until=None, channel=None):
+        """
+        Yield the landed messages of each file whose date falls in [since, until] (YYYY-MM-DD strings),
+        optionally for a single channel. One file is held in memory at a time.
+        """
+        for entry in self.load_manifest()["files"]:
+            if since and entry["date"] < since:
+                continue
+            if until and entry["date"] > until:
+                continue
+            if channel and entry["channel"] != channel:
+                continue
+            with gzip.open(os.path.join(self.root, entry["path"]), "rt", encoding="utf-8") as f:
+                yield entry, [json.loads(line) for line in f]
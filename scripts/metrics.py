@@ -0,0 +1,87 @@
+import functools
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, write_to_textfile
+
+# Directory where standalone runs (e.g. detect_object.py) write <name>.prom files for the API's /metrics
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "metrics")
+)
+
+# Import this module as `metrics` (with scripts/ on sys.path) everywhere, so the metrics are registered once
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"],
+)
+
+SCRAPE_CHANNEL_SECONDS = Histogram(
+    "scrape_channel_duration_seconds", "Time to fetch one channel's new messages", ["channel"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+SCRAPE_MESSAGES = Counter("scrape_messages_total", "Messages fetched from Telegram", ["channel"])
+
+CLEANER_STAGE_SECONDS = Histogram(
+    "cleaner_stage_duration_seconds", "Time spent in each DataFrameCleaner stage", ["stage"],
+)
+CLEANER_STAGE_ROWS = Counter("cleaner_stage_rows_total", "Rows passed through each DataFrameCleaner stage", ["stage"])
+
+DB_INSERT_SECONDS = Histogram("db_insert_duration_seconds", "Time spent writing one insert batch", ["table"])
+DB_INSERT_ROWS = Counter("db_insert_rows_total", "Rows newly written, per table", ["table"])
+
+# Detection runs as its own process, so its metrics live in a separate registry that is
+# written to METRICS_DIR/detection.prom and served from there by the API
+DETECTION_REGISTRY = CollectorRegistry()
+DETECTION_IMAGES = Counter(
+    "detection_images_total", "Images run through object detection", registry=DETECTION_REGISTRY,
+)
+DETECTION_BATCH_SECONDS = Histogram(
+    "detection_batch_duration_seconds", "Model time per detection batch", registry=DETECTION_REGISTRY,
+)
+DETECTION_IMAGES_PER_SECOND = Gauge(
+    "detection_images_per_second", "Throughput of the last detection run", registry=DETECTION_REGISTRY,
+)
+
+
+def timed_stage(stage):
+    """
+    Decorate a DataFrameCleaner method to record its duration and the number of rows it received.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            CLEANER_STAGE_ROWS.labels(stage).inc(len(self.df))
+            with CLEANER_STAGE_SECONDS.labels(stage).time():
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_insert(table, rows, started):
+    """
+    Record one insert batch that began at `started` (time.perf_counter()) and wrote `rows` new rows.
+    """
+    DB_INSERT_SECONDS.labels(table).observe(time.perf_counter() - started)
+    DB_INSERT_ROWS.labels(table).inc(rows)
+
+
+def write_textfile(name, registry):
+    """
+    Save the metrics of a standalone run to METRICS_DIR/<name>.prom for the API to serve.
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    write_to_textfile(os.path.join(METRICS_DIR, f"{name}.prom"), registry)
+
+
+def read_textfiles():
+    """
+    Concatenated contents of the .prom files written by standalone runs.
+    """
+    if not os.path.isdir(METRICS_DIR):
+        return b""
+    parts = []
+    for file in sorted(os.listdir(METRICS_DIR)):
+        if file.endswith(".prom"):
+            with open(os.path.join(METRICS_DIR, file), "rb") as f:
+                parts.append(f.read())
+    return b"".join(parts)
@@ -1,5 +1,8 @@
+import csv
+import io
 import os
 import logging
+from concurrent.futures import ProcessPoolExecutor
 import psycopg2
 from sqlalchemy.engine.url import make_url
 from dotenv import load_dotenv
@@ -7,9 +10,6 @@ from dotenv import load_dotenv
 load_dotenv("./.env")
 
 DB_URL = os.getenv("DATABASE_URL")
-if not DB_URL:
-    print("❌ DB_URL is not set. Please provide the connection URL in the .env file.")
-    exit(1)
 
 # Set up logging
 log_folder = './logs'
@@ -24,6 +24,11 @@ logging.basicConfig(
 
 labels_folder = './images/detected_images/labels/'
 
+# Label files replaced per transaction
+LOAD_BATCH_FILES = int(os.getenv("LOAD_BATCH_FILES", "500"))
+# Processes parsing label files
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
 # PostgreSQL table creation query
 CREATE_TABLE_QUERY = '''
 CREATE TABLE IF NOT EXISTS image_data (
@@ -36,94 +41,160 @@ CREATE TABLE IF NOT EXISTS image_data (
     width FLOAT NOT NULL,
     height FLOAT NOT NULL
 );
+CREATE INDEX IF NOT EXISTS ix_image_data_file_name ON image_data (file_name);
+'''
+
+# Reruns replace a file's rows instead of appending duplicates
+DELETE_FILES_QUERY = '''
+DELETE FROM image_data WHERE file_name = ANY(%s);
 '''
 
-# PostgreSQL insert query
-INSERT_QUERY = '''
-INSERT INTO image_data (file_name, object_name, confidence, x_center, y_center, width, height)
-VALUES (%s, %s, %s, %s, %s, %s, %s);
+COPY_QUERY = '''
+COPY image_data (file_name, object_name, confidence, x_center, y_center, width, height) FROM STDIN WITH (FORMAT csv)
 '''
 
-try:
-    # Parse DB_URL and connect to PostgreSQL
+
+def connect():
+    """
+    Parse DB_URL, connect to PostgreSQL and make sure the image_data table exists.
+    """
+    if not DB_URL:
+        raise ValueError("DB_URL is not set. Please provide the connection URL in the .env file.")
     db_url = make_url(DB_URL)
     conn = psycopg2.connect(
         dbname=db_url.database, user=db_url.username, password=db_url.password,
         host=db_url.host, port=db_url.port
     )
-    cursor = conn.cursor()
-
-    # Create table if not exists
-    cursor.execute(CREATE_TABLE_QUERY)
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_QUERY)
     conn.commit()
     logging.info("Connected to PostgreSQL and ensured table exists.")
+    return conn
 
-    # Ensure labels folder exists
-    if not os.path.exists(labels_folder):
-        msg = f"Error: The folder '{labels_folder}' does not exist."
-        print(msg)
-        logging.error(msg)
-    else:
-        logging.info(f"Processing label files from {labels_folder}")
-
-        for file in sorted(os.listdir(labels_folder)):
-            file_path = os.path.join(labels_folder, file)
-
-            try:
-                with open(file_path, 'r') as f:
-                    lines = f.readlines()
-                    if not lines:
-                        msg = f"Warning: {file} is empty."
-                        print(msg)
-                        logging.warning(msg)
-                        continue
-
-                    for line in lines:
-                        try:
-                            parts = line.strip().split()
-                            
-                            # Object Name is everything before the first number
-                            object_name = " ".join([p for p in parts if not p.replace('.', '', 1).isdigit()])
-                            
-                            # Extract Numeric Values
-                            numbers = [float(p) for p in parts if p.replace('.', '', 1).isdigit()]
-
-                            if len(numbers) == 5:  # Expected format
-                                confidence, x_min, y_min, x_max, y_max = numbers
-
-                                # Convert bounding box to center format (x_center, y_center, width, height)
-                                x_center = (x_min + x_max) / 2
-                                y_center = (y_min + y_max) / 2
-                                width = x_max - x_min
-                                height = y_max - y_min
-
-                                cursor.execute(INSERT_QUERY, (file, object_name, confidence, x_center, y_center, width, height))
-
-                            else:
-                                msg = f"⚠ Error in {file}: Incorrect number of values -> {line.strip()}"
-                                print(msg)
-                                logging.error(msg)
-                                continue
-
-                        except ValueError as e:
-                            msg = f"⚠ Error in {file}: Skipping malformed line -> {line.strip()} | {e}"
-                            print(msg)
-                            logging.error(msg)
-                conn.commit()  # Commit after processing each file
-            except Exception as e:
-                msg = f"❌ Failed to process {file}: {e}"
-                print(msg)
-                logging.error(msg)
 
-    # Close the connection
-    cursor.close()
-    conn.close()
+def to_row(object_name, confidence, x_min, y_min, x_max, y_max):
+    """
+    Convert a corner-format box to the (object_name, confidence, x_center, y_center, width, height) row.
+    """
+    return (
+        object_name, confidence,
+        (x_min + x_max) / 2, (y_min + y_max) / 2,
+        x_max - x_min, y_max - y_min,
+    )
+
 
-    msg = "✅ Data successfully stored in PostgreSQL."
-    print(msg)
-    logging.info(msg)
+def parse_label_file(file_path):
+    """
+    Parse one label file of "<object name> <confidence> <x1> <y1> <x2> <y2>" lines.
+    The object name may contain spaces, so the five numbers are taken from the right.
+    :return: Tuple of (file name, list of rows, list of error messages); rows is None when
+        the file could not be read at all, so its stored rows are left alone
+    """
+    file = os.path.basename(file_path)
+    rows = []
+    errors = []
+    try:
+        with open(file_path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                if len(parts) < 6:
+                    errors.append(f"⚠ Error in {file}: Incorrect number of values -> {line.strip()}")
+                    continue
+                try:
+                    numbers = [float(p) for p in parts[-5:]]
+                except ValueError as e:
+                    errors.append(f"⚠ Error in {file}: Skipping malformed line -> {line.strip()} | {e}")
+                    continue
+                rows.append(to_row(" ".join(parts[:-5]), *numbers))
+    except Exception as e:
+        # e.g. a stray subdirectory or a file that is not UTF-8; skip it like the rest of the folder
+        return file, None, [f"❌ Failed to process {file}: {e}"]
+    if not rows and not errors:
+        errors.append(f"Warning: {file} is empty.")
+    return file, rows, errors
+
+
+def store_detections(conn, detections_by_file):
+    """
+    Replace the image_data rows of every file in `detections_by_file` in one transaction:
+    delete what a previous run stored for those files, then COPY the new rows in.
+    :param detections_by_file: Mapping of file name to a list of rows from to_row
+    :return: Number of rows written
+    """
+    if not detections_by_file:
+        return 0
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for file, rows in detections_by_file.items():
+        for row in rows:
+            writer.writerow((file, *row))
+            count += 1
+    buffer.seek(0)
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(DELETE_FILES_QUERY, (list(detections_by_file),))
+            cursor.copy_expert(COPY_QUERY, buffer)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def load_label_folder(conn, folder=labels_folder, workers=PARSE_WORKERS, batch_files=LOAD_BATCH_FILES):
+    """
+    Parse every label file in `folder` across processes and bulk-load the results.
+    :return: Number of rows written
+    """
+    paths = [os.path.join(folder, file) for file in sorted(os.listdir(folder))]
+    written = 0
+    batch = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file, rows, errors in executor.map(parse_label_file, paths, chunksize=64):
+            for msg in errors:
+                print(msg)
+                logging.error(msg)
+            if rows is None:
+                continue
+            batch[file] = rows
+            if len(batch) >= batch_files:
+                written += store_detections(conn, batch)
+                batch = {}
+    written += store_detections(conn, batch)
+    return written
+
+
+if __name__ == "__main__":
+    if not DB_URL:
+        print("❌ DB_URL is not set. Please provide the connection URL in the .env file.")
+        exit(1)
+
+    try:
+        conn = connect()
+
+        # Ensure labels folder exists
+        if not os.path.exists(labels_folder):
+            msg = f"Error: The folder '{labels_folder}' does not exist."
+            print(msg)
+            logging.error(msg)
+        else:
+            logging.info(f"Processing label files from {labels_folder}")
+            written = load_label_folder(conn)
+            logging.info(f"Stored {written} detected objects.")
+
+        # Close the connection
+        conn.close()
+
+        msg = "✅ Data successfully stored in PostgreSQL."
+        print(msg)
+        logging.info(msg)
 
-except Exception as e:
-    msg = f"❌ Database connection error: {e}"
-    print(msg)
-    logging.error(msg)
+    except Exception as e:
+        msg = f"❌ Database connection error: {e}"
+        print(msg)
+        logging.error(msg)
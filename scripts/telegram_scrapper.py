@@ -1,8 +1,18 @@
+import asyncio
+import hashlib
+import json
 import logging
+import sys
+import time
 from telethon.sync import TelegramClient
+from telethon.errors import FloodWaitError
 import os
 from dotenv import load_dotenv
 
+# Imported as scripts.telegram_scrapper by app.py; make the shared metrics module importable
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import metrics
+
 # Load environment variables
 load_dotenv()
 os.makedirs("logs", exist_ok=True)
@@ -17,10 +27,125 @@ API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 SESSION_NAME = 'scraper_session'
 
+# Download photos attached to scraped messages
+DOWNLOAD_MEDIA = os.getenv("DOWNLOAD_MEDIA", "true").strip().lower() in ("1", "true", "yes", "on")
+# Content-addressed media store
+MEDIA_DIR = os.getenv("MEDIA_DIR", "../data/media")
+# Photos downloaded at the same time
+MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", "4"))
+# Runs that retry a failed photo download before its message is stored without media
+MEDIA_RETRIES = int(os.getenv("MEDIA_RETRIES", "3"))
+# Telegram serves files in parts whose offsets must be multiples of 4 KiB
+DOWNLOAD_REQUEST_SIZE = 512 * 1024
+DOWNLOAD_ALIGNMENT = 4096
+
+
+class MediaDownloader:
+    def __init__(self, client, media_dir=MEDIA_DIR, concurrency=MEDIA_CONCURRENCY):
+        """
+        Downloads message photos with bounded concurrency into a content-addressed store
+        (<media_dir>/<sha256[:2]>/<sha256>.jpg), so a photo reposted across channels is
+        fetched once per Telegram photo id and stored once per content hash.
+        Interrupted downloads resume from their .part file.
+        """
+        self.client = client
+        self.media_dir = media_dir
+        self.partial_dir = os.path.join(media_dir, "partial")
+        self.index_path = os.path.join(media_dir, "index.json")
+        self.failures_path = os.path.join(media_dir, "failures.json")
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = {}  # media key -> download task
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self.index = self._load_json(self.index_path)  # media key -> stored file path
+        self.failures = self._load_json(self.failures_path)  # media key -> failed attempts so far
+
+    def _load_json(self, path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            logging.error(f"Error loading media state '{path}': {e}")
+            return {}
+
+    def _save_json(self, path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def save_index(self):
+        self._save_json(self.index_path, self.index)
+        self._save_json(self.failures_path, self.failures)
+
+    async def download(self, message):
+        """
+        Return the local path of the message's photo, downloading it if needed.
+        Concurrent requests for the same photo share one download.
+        A failed download returns None, so the message can be fetched again on the next run,
+        until it has failed MEDIA_RETRIES times; after that it returns "No media".
+        """
+        key = f"photo_{message.photo.id}"
+        path = self.index.get(key)
+        if path and os.path.exists(path):
+            return path
+
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(key, message.photo))
+            self.in_flight[key] = task
+        return await task
+
+    async def _download(self, key, photo):
+        part_path = os.path.join(self.partial_dir, f"{key}.part")
+        try:
+            async with self.semaphore:
+                # Resume from the last complete aligned part of an earlier attempt
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                offset -= offset % DOWNLOAD_ALIGNMENT
+                with open(part_path, "r+b" if offset else "wb") as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    async for chunk in self.client.iter_download(
+                        photo, offset=offset, request_size=DOWNLOAD_REQUEST_SIZE
+                    ):
+                        f.write(chunk)
+
+            digest = hashlib.sha256()
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            sha256 = digest.hexdigest()
+
+            path = os.path.join(self.media_dir, sha256[:2], f"{sha256}.jpg")
+            if os.path.exists(path):
+                os.remove(part_path)  # Same content already stored under another photo id
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(part_path, path)
+
+            self.index[key] = path
+            self.failures.pop(key, None)
+            return path
+        except Exception as e:
+            attempts = self.failures.get(key, 0) + 1
+            if attempts >= MEDIA_RETRIES:
+                logging.error(f"Error downloading {key}, giving up after {attempts} attempts: {e}")
+                self.failures.pop(key, None)
+                return "No media"
+            logging.error(f"Error downloading {key} (attempt {attempts}/{MEDIA_RETRIES}), retrying next run: {e}")
+            self.failures[key] = attempts
+            return None
+        finally:
+            self.in_flight.pop(key, None)
+
+
 class TelegramScraper:
-    def __init__(self):
+    def __init__(self, download_media=DOWNLOAD_MEDIA):
         logging.info("Initializing Telegram client...")
         self.client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
+        self.downloader = MediaDownloader(self.client) if download_media else None
 
     async def start(self):
         await self.client.start()
@@ -31,6 +156,8 @@ class TelegramScraper:
             min_id = 0
 
         messages = []
+        media_downloads = []
+        started = time.perf_counter()
         try:
             logging.info(f"Fetching messages from {channel_name} with min_id={min_id}...")
             async for message in self.client.iter_messages(channel_name, limit=limit, min_id=min_id):
@@ -40,16 +167,29 @@ class TelegramScraper:
                     "sender": message.sender_id,
                     "timestamp": message.date.isoformat(),
                     "text": message.message or "",
-                    "media": "No media",  # Ignore media
+                    "media": "No media",
                 }
+                if self.downloader and message.photo:
+                    # Download in the background so fetching the next messages is not held up
+                    media_downloads.append((msg_data, asyncio.ensure_future(self.downloader.download(message))))
                 messages.append(msg_data)
+
+            for msg_data, download in media_downloads:
+                msg_data["media"] = await download
             logging.info(f"Fetched {len(messages)} messages from {channel_name}.")
+        except FloodWaitError:
+            # Let the caller back off and retry this channel
+            raise
         except Exception as e:
             logging.error(f"Error fetching messages from {channel_name}: {e}")
 
+        metrics.SCRAPE_CHANNEL_SECONDS.labels(channel_name).observe(time.perf_counter() - started)
+        metrics.SCRAPE_MESSAGES.labels(channel_name).inc(len(messages))
         return messages
 
     async def close(self):
+        if self.downloader:
+            self.downloader.save_index()
         logging.info("Disconnecting Telegram client...")
         await self.client.disconnect()
         logging.info("Telegram client disconnected.")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# The pipeline modules resolve paths such as ../logs relative to api/, like the running API
+os.chdir(os.path.join(ROOT, "api"))
+sys.path[:0] = [os.path.join(ROOT, "scripts"), os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+import data_cleaning
+from data_cleaning import DataFrameCleaner, compare_engines, frame_from_rows
+from synthetic import RAW_COLUMNS, generate_messages, raw_rows
+
+
+def test_vectorized_emoji_extraction_matches_legacy():
+    df = pd.DataFrame({"message": ["ok 💊✨ ©\nline", "ለቆዳ 👍🏽 ጤንነት", "", None, "plain text"]})
+    results = []
+    for engine in ("legacy", "vectorized"):
+        cleaner = DataFrameCleaner(df.copy(), engine=engine)
+        cleaner.clean_text()
+        results.append(cleaner.df)
+    legacy, vectorized = results
+    assert legacy["emoji"].tolist() == vectorized["emoji"].tolist()
+    assert legacy["message"].tolist() == vectorized["message"].tolist()
+
+
+def test_media_only_posts_get_no_content_hash():
+    df = pd.DataFrame({
+        "channel_name": ["chan", "chan", "chan", "chan"],
+        "message": ["No message", "No message", "Same text", "same  TEXT"],
+    })
+    cleaner = DataFrameCleaner(df)
+    cleaner.clean_text()
+    hashes = cleaner.hash_content()
+    assert hashes.iloc[0] is None and hashes.iloc[1] is None
+    assert hashes.iloc[2] == hashes.iloc[3]
+    assert len(cleaner.drop_duplicates()) == 3
+
+
+@pytest.mark.parametrize("dtypes", ["object", "arrow"])
+def test_compare_engines_agrees_for_both_dtypes(dtypes):
+    df = frame_from_rows(raw_rows(generate_messages(500, seed=3)), RAW_COLUMNS, dtypes=dtypes)
+    assert compare_engines(df)
+
+
+def test_compare_engines_reports_differences(monkeypatch):
+    df = frame_from_rows(raw_rows(generate_messages(200, seed=3)), RAW_COLUMNS, dtypes="object")
+    real = data_cleaning.clean_messages
+
+    def diverging(frame, engine=None, workers=None):
+        cleaned = real(frame, engine=engine, workers=workers)
+        if engine == "vectorized":
+            cleaned["emoji"] = "changed"
+        return cleaned
+
+    monkeypatch.setattr(data_cleaning, "clean_messages", diverging)
+    assert not compare_engines(df)